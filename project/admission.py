@@ -0,0 +1,165 @@
+import os
+import math
+import time
+import heapq
+import datetime as dt
+
+from celery.result import AsyncResult
+
+from broker import redis_client
+from registry import sync, predicted_duration, duration_rate, submitted_tasks
+
+# all limits are counted over queued + running tasks
+MAX_QUEUED_TASKS = int(os.environ.get("MAX_QUEUED_TASKS", 20))
+MAX_CLIENT_TASKS = int(os.environ.get("MAX_CLIENT_TASKS", 5))
+WORKER_CONCURRENCY = int(os.environ.get("WORKER_CONCURRENCY", 1))
+DURATION_HISTORY = int(os.environ.get("DURATION_HISTORY", 50))
+DEFAULT_TASK_DURATION = float(os.environ.get("DEFAULT_TASK_DURATION", 120))
+
+TASKS_KEY = "admission:tasks"
+CLIENT_TASKS_KEY = "admission:client:{}"
+DURATIONS_KEY = "admission:durations"
+STARTED_KEY = "admission:started"
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def profile_budget(profile):
+    # worst case duration of a task: every phase runs until its time limit
+    return sum(
+        float(phase.get('max_iteration_search_time', 0))
+        for phase in profile.values() if isinstance(phase, dict)
+    )
+
+
+def estimated_duration(profile=None, size=None):
+    # by durations of registered tasks of other sizes when known, else of the last tasks of any size
+    if size is not None:
+        predicted = predicted_duration(*size)
+        if predicted is not None:
+            return predicted
+
+    durations = [float(d) for d in redis_client.lrange(DURATIONS_KEY, 0, -1)]
+    if durations:
+        return sum(durations) / len(durations)
+
+    if profile and profile_budget(profile) > 0:
+        return profile_budget(profile)
+
+    return DEFAULT_TASK_DURATION
+
+
+def in_flight(key):
+    # drop finished tasks lazily, so the sets never grow beyond the limits;
+    # the registry takes their outcome then, durations of the tasks predicted ones are based on
+    task_ids = [t.decode() for t in redis_client.smembers(key)]
+    finished = [t for t in task_ids if AsyncResult(t).ready()]
+    if finished:
+        redis_client.srem(key, *finished)
+        redis_client.hdel(STARTED_KEY, *finished)
+        sync(finished)
+
+    return len(task_ids) - len(finished)
+
+
+def backlog():
+    # admitted tasks: running ones -> expected seconds left, queued ones as (id, expected seconds)
+    # in order of submission; ones not registered yet are the last ones
+    task_ids = admitted()
+    started = {t.decode(): float(s) for t, s in redis_client.hgetall(STARTED_KEY).items()}
+
+    rate = duration_rate()
+    durations = {}
+    for task_id, employees, intervals, profile in submitted_tasks(task_ids):
+        predicted = predicted_duration(employees, intervals, rate) if rate is not None else None
+        durations[task_id] = predicted if predicted is not None else estimated_duration(profile)
+    for task_id in task_ids - durations.keys():
+        durations[task_id] = estimated_duration()
+
+    now = time.time()
+    running, queued = {}, []
+    for task_id, duration in durations.items():
+        if task_id in started:
+            running[task_id] = max(started[task_id] + duration - now, 0)
+        else:
+            queued.append((task_id, duration))
+
+    return running, queued
+
+
+def schedule(running, queued):
+    # expected seconds until every task finishes, queued tasks start in order as soon as a worker is free;
+    # and seconds until a worker is free after all of them
+    slots = list(running.values()) + [0] * max(WORKER_CONCURRENCY - len(running), 0)
+    heapq.heapify(slots)
+
+    finish = dict(running)
+    for task_id, duration in queued:
+        start = heapq.heappop(slots)
+        finish[task_id] = start + duration
+        heapq.heappush(slots, start + duration)
+
+    return finish, slots[0]
+
+
+def retry_seconds(finish, task_ids=None):
+    # seconds until the first of the tasks is expected to finish, freeing its place
+    seconds = [s for t, s in finish.items() if task_ids is None or t in task_ids]
+    return max(math.ceil(min(seconds, default=0)), 1)
+
+
+def admit(client_id):
+    queued = in_flight(TASKS_KEY)
+    client_queued = in_flight(CLIENT_TASKS_KEY.format(client_id))
+    finish, free = schedule(*backlog())
+
+    if queued >= MAX_QUEUED_TASKS:
+        raise AdmissionRejected(f"Queue is full: {queued} tasks queued or running", retry_seconds(finish))
+
+    if client_queued >= MAX_CLIENT_TASKS:
+        client_tasks = {t.decode() for t in redis_client.smembers(CLIENT_TASKS_KEY.format(client_id))}
+        raise AdmissionRejected(
+            f"Client quota exceeded: {client_queued} tasks queued or running", retry_seconds(finish, client_tasks)
+        )
+
+    return (queued, dt.datetime.now(dt.timezone.utc) + dt.timedelta(seconds=free))
+
+
+def queue_position(task_id):
+    # (tasks ahead, eta) of an admitted task: running tasks and queued ones admitted before it are ahead
+    # of a queued one, a running one has started already
+    now = dt.datetime.now(dt.timezone.utc)
+    if AsyncResult(task_id).status != 'PENDING':
+        return (0, now)
+
+    in_flight(TASKS_KEY)
+    running, queued = backlog()
+    ids = [t for t, _ in queued]
+    ahead = queued[:ids.index(task_id)] if task_id in ids else queued
+
+    _, free = schedule(running, ahead)
+    return (len(running) + len(ahead), now + dt.timedelta(seconds=free))
+
+
+def admitted():
+    # ids of admitted tasks not seen finished yet; celery reports the ones still queued as PENDING
+    return {t.decode() for t in redis_client.smembers(TASKS_KEY)}
+
+
+def register(task_id, client_id):
+    redis_client.sadd(TASKS_KEY, task_id)
+    redis_client.sadd(CLIENT_TASKS_KEY.format(client_id), task_id)
+
+
+def record_start(task_id):
+    redis_client.hset(STARTED_KEY, task_id, time.time())
+
+
+def record_duration(seconds):
+    redis_client.lpush(DURATIONS_KEY, seconds)
+    redis_client.ltrim(DURATIONS_KEY, 0, DURATION_HISTORY - 1)
@@ -0,0 +1,362 @@
+import os
+import gzip
+import time
+import shutil
+import tempfile
+from pathlib import Path
+
+# where task inputs and results are kept: "local" directory shared by api and workers,
+# or "s3" bucket of any s3 compatible storage (minio in docker-compose), so workers need no shared disk
+ARTIFACT_STORE = os.environ.get("ARTIFACT_STORE", "local")
+ARTIFACT_DIR = os.environ.get("ARTIFACT_DIR", "./tmp")
+# local copies of s3 artifacts: worker working directories and files the api reads as a whole
+WORK_DIR = os.environ.get("WORK_DIR", "./tmp")
+# local copies not read for this long are removed, the api checks for them at most every interval; 0 keeps them
+WORK_DIR_MAX_AGE = float(os.environ.get("WORK_DIR_MAX_AGE", 24 * 60 * 60))
+WORK_DIR_EVICT_INTERVAL = float(os.environ.get("WORK_DIR_EVICT_INTERVAL", 10 * 60))
+S3_BUCKET = os.environ.get("S3_BUCKET", "workforce")
+S3_ENDPOINT_URL = os.environ.get("S3_ENDPOINT_URL")
+
+CHUNK_SIZE = 1024 * 1024
+# marker artifact of tasks retention never removes
+PIN = '.pinned'
+# artifacts retention leaves uncompressed: small, already compressed or unfinished
+UNCOMPRESSED_SUFFIXES = ['.gz', '.parquet', '.tmp']
+
+
+def compressible(name, size, min_bytes):
+    return name != PIN and size >= min_bytes and Path(name).suffix not in UNCOMPRESSED_SUFFIXES
+
+
+def temporary_path(target):
+    # unique file next to target, concurrent readers of a task never write the same temporary file
+    fd, path = tempfile.mkstemp(dir=Path(target).parent, prefix=f'.{Path(target).name}.', suffix='.tmp')
+    os.close(fd)
+    return path
+
+
+def replace_with(target, write):
+    # target written by write(file) into a temporary file and moved into place at once
+    path = temporary_path(target)
+    try:
+        with open(path, 'wb') as f:
+            write(f)
+        os.replace(path, target)
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+
+
+def gunzip(source, target):
+    # compressed artifacts are read as the original ones
+    def write(dst):
+        with gzip.open(source, 'rb') as src:
+            shutil.copyfileobj(src, dst, CHUNK_SIZE)
+
+    replace_with(target, write)
+
+
+def chunks(file):
+    with file:
+        yield from iter(lambda: file.read(CHUNK_SIZE), b'')
+
+
+class LocalStore:
+    # artifacts of a task are files of the task's directory, workers solve right in it
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def prepare(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def task_dir(self, task_id):
+        return self.root / task_id
+
+    def put(self, task_id, name, file):
+        path = self.task_dir(task_id) / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'wb') as f:
+            shutil.copyfileobj(file, f, CHUNK_SIZE)
+
+    def exists(self, task_id, name):
+        path = self.task_dir(task_id) / name
+        return path.exists() or Path(f'{path}.gz').exists()
+
+    def stream(self, task_id, name):
+        # chunks of an artifact, None when there's no such artifact
+        path = self.task_dir(task_id) / name
+        if path.exists():
+            return chunks(open(path, 'rb'))
+        if Path(f'{path}.gz').exists():
+            return chunks(gzip.open(f'{path}.gz', 'rb'))
+        return None
+
+    def copy(self, task_id, name, target_id, target_name=None):
+        source = self.task_dir(task_id) / name
+        target = self.task_dir(target_id) / (target_name or name)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if source.exists():
+            shutil.copyfile(source, target)
+        else:
+            shutil.copyfile(f'{source}.gz', f'{target}.gz')
+
+    def fetch(self, task_id, names=None):
+        # local directory with the artifacts (all or the names existing) of a task,
+        # compressed ones are decompressed back in place, retention compresses them again later.
+        # readers of the same task race on that: the one losing finds the artifact decompressed
+        task_dir = self.task_dir(task_id)
+        if names is None:
+            names = [p.relative_to(task_dir).as_posix()[:-3] for p in task_dir.rglob('*.gz')]
+
+        for name in names:
+            path = task_dir / name
+            if path.exists() or not Path(f'{path}.gz').exists():
+                continue
+            try:
+                gunzip(f'{path}.gz', path)
+            except FileNotFoundError:
+                if not path.exists():
+                    raise
+            try:
+                os.remove(f'{path}.gz')
+            except FileNotFoundError:
+                pass
+
+        return task_dir
+
+    def publish(self, task_id, local_dir):
+        # stores files of a local directory as the task's artifacts
+        if Path(local_dir).resolve() != self.task_dir(task_id).resolve():
+            shutil.copytree(local_dir, self.task_dir(task_id), dirs_exist_ok=True)
+
+    def discard(self, task_id):
+        # local copy of a task's artifacts, the task's directory is the store itself
+        pass
+
+    def evict(self):
+        pass
+
+    def task_ids(self):
+        return [p.name for p in self.root.iterdir() if p.is_dir()] if self.root.exists() else []
+
+    def remove(self, task_id, name):
+        for path in [self.task_dir(task_id) / name, Path(f'{self.task_dir(task_id) / name}.gz')]:
+            if path.exists():
+                path.unlink()
+
+    def delete(self, task_id):
+        shutil.rmtree(self.task_dir(task_id), ignore_errors=True)
+
+    def usage(self, task_id):
+        # bytes stored, when the first artifact was stored (unix time), whether compressed or pinned
+        files = [p for p in self.task_dir(task_id).rglob('*') if p.is_file()]
+        stats = [p.stat() for p in files]
+        return {
+            'bytes': sum(s.st_size for s in stats),
+            'created': min((s.st_mtime for s in stats), default=None),
+            'compressed': any(p.suffix == '.gz' for p in files),
+            'pinned': (self.task_dir(task_id) / PIN).exists()
+        }
+
+    def compress(self, task_id, min_bytes):
+        # gzips artifacts in place keeping their modification time; returns bytes saved
+        saved = 0
+        for path in [p for p in self.task_dir(task_id).rglob('*') if p.is_file()]:
+            stat = path.stat()
+            if not compressible(path.name, stat.st_size, min_bytes):
+                continue
+
+            with open(path, 'rb') as src, gzip.open(f'{path}.gz.tmp', 'wb') as dst:
+                shutil.copyfileobj(src, dst, CHUNK_SIZE)
+            os.utime(f'{path}.gz.tmp', (stat.st_atime, stat.st_mtime))
+            os.replace(f'{path}.gz.tmp', f'{path}.gz')
+            path.unlink()
+            saved += stat.st_size - os.path.getsize(f'{path}.gz')
+
+        return saved
+
+
+class S3Store:
+    # artifacts of a task are objects under the task id prefix. results don't change once published,
+    # so local copies in work_dir are reused
+    def __init__(self, bucket, work_dir, endpoint_url=None, client=None):
+        if client is None:
+            import boto3
+            client = boto3.client('s3', endpoint_url=endpoint_url)
+
+        self.client = client
+        self.bucket = bucket
+        self.work_dir = Path(work_dir)
+        self.errors = client.exceptions
+        self.evicted = time.monotonic()
+
+    def prepare(self):
+        try:
+            self.client.head_bucket(Bucket=self.bucket)
+        except self.errors.ClientError:
+            self.client.create_bucket(Bucket=self.bucket)
+
+    def task_dir(self, task_id):
+        return self.work_dir / task_id
+
+    def key(self, task_id, name):
+        return f'{task_id}/{name}'
+
+    def put(self, task_id, name, file):
+        # multipart upload, the file is read in chunks
+        self.client.upload_fileobj(file, self.bucket, self.key(task_id, name))
+
+    def has_object(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except self.errors.ClientError:
+            return False
+
+    def exists(self, task_id, name):
+        return self.has_object(self.key(task_id, name)) or self.has_object(self.key(task_id, f'{name}.gz'))
+
+    def stream(self, task_id, name):
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self.key(task_id, name))['Body'].iter_chunks(CHUNK_SIZE)
+        except self.errors.NoSuchKey:
+            pass
+        try:
+            body = self.client.get_object(Bucket=self.bucket, Key=self.key(task_id, f'{name}.gz'))['Body']
+        except self.errors.NoSuchKey:
+            return None
+        return chunks(gzip.GzipFile(fileobj=body, mode='rb'))
+
+    def copy(self, task_id, name, target_id, target_name=None):
+        suffix = '' if self.has_object(self.key(task_id, name)) else '.gz'
+        self.client.copy_object(
+            Bucket=self.bucket, Key=self.key(target_id, f'{target_name or name}{suffix}'),
+            CopySource={'Bucket': self.bucket, 'Key': self.key(task_id, f'{name}{suffix}')}
+        )
+
+    def objects(self, task_id):
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=f'{task_id}/'):
+            yield from page.get('Contents', [])
+
+    def names(self, task_id):
+        for o in self.objects(task_id):
+            yield o['Key'][len(task_id) + 1:]
+
+    def download(self, key, path, compressed=False):
+        # an object into a local file written at once, concurrent readers download into files of their own
+        def write(dst):
+            body = self.client.get_object(Bucket=self.bucket, Key=key)['Body']
+            src = gzip.GzipFile(fileobj=body, mode='rb') if compressed else body
+            shutil.copyfileobj(src, dst, CHUNK_SIZE)
+
+        replace_with(path, write)
+
+    def fetch(self, task_id, names=None):
+        # compressed artifacts are decompressed into their local copies. a local copy is used while
+        # the object exists: retention may have removed the task since it was copied
+        local_dir = self.task_dir(task_id)
+        if local_dir.exists():
+            os.utime(local_dir)
+        if names is None:
+            names = [n[:-3] if n.endswith('.gz') else n for n in self.names(task_id)]
+
+        for name in names:
+            path = local_dir / name
+            if self.has_object(self.key(task_id, name)):
+                if not path.exists():
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    self.download(self.key(task_id, name), path)
+            elif self.has_object(self.key(task_id, f'{name}.gz')):
+                if not path.exists():
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    self.download(self.key(task_id, f'{name}.gz'), path, compressed=True)
+            elif path.exists():
+                path.unlink()
+
+        return local_dir
+
+    def evict(self):
+        # removes local copies of tasks not fetched for WORK_DIR_MAX_AGE; fetch marks a copy used
+        if WORK_DIR_MAX_AGE <= 0 or time.monotonic() - self.evicted < WORK_DIR_EVICT_INTERVAL:
+            return
+        self.evicted = time.monotonic()
+
+        if not self.work_dir.exists():
+            return
+        oldest = time.time() - WORK_DIR_MAX_AGE
+        for path in self.work_dir.iterdir():
+            try:
+                if path.is_dir() and path.stat().st_mtime < oldest:
+                    shutil.rmtree(path, ignore_errors=True)
+            except FileNotFoundError:
+                pass
+
+    def publish(self, task_id, local_dir):
+        for path in sorted(Path(local_dir).rglob('*')):
+            if path.is_file():
+                self.client.upload_file(str(path), self.bucket, self.key(task_id, path.relative_to(local_dir).as_posix()))
+
+    def discard(self, task_id):
+        # local copy of a task's artifacts, objects stay
+        shutil.rmtree(self.task_dir(task_id), ignore_errors=True)
+
+    def task_ids(self):
+        paginator = self.client.get_paginator('list_objects_v2')
+        return [
+            p['Prefix'].rstrip('/')
+            for page in paginator.paginate(Bucket=self.bucket, Delimiter='/')
+            for p in page.get('CommonPrefixes', [])
+        ]
+
+    def remove(self, task_id, name):
+        for key in [self.key(task_id, name), self.key(task_id, f'{name}.gz')]:
+            self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def delete(self, task_id):
+        keys = [{'Key': self.key(task_id, name)} for name in self.names(task_id)]
+        for i in range(0, len(keys), 1000):
+            self.client.delete_objects(Bucket=self.bucket, Delete={'Objects': keys[i:i + 1000]})
+        shutil.rmtree(self.task_dir(task_id), ignore_errors=True)
+
+    def usage(self, task_id):
+        objects = list(self.objects(task_id))
+        return {
+            'bytes': sum(o['Size'] for o in objects),
+            'created': min((o['LastModified'].timestamp() for o in objects), default=None),
+            'compressed': any(o['Key'].endswith('.gz') for o in objects),
+            'pinned': any(o['Key'] == self.key(task_id, PIN) for o in objects)
+        }
+
+    def compress(self, task_id, min_bytes):
+        # objects are gzipped through a temporary file, never held in memory
+        saved = 0
+        for o in list(self.objects(task_id)):
+            name = o['Key'][len(task_id) + 1:]
+            if not compressible(name, o['Size'], min_bytes):
+                continue
+
+            with tempfile.TemporaryFile() as tmp:
+                body = self.client.get_object(Bucket=self.bucket, Key=o['Key'])['Body']
+                with gzip.GzipFile(fileobj=tmp, mode='wb') as dst:
+                    for chunk in body.iter_chunks(CHUNK_SIZE):
+                        dst.write(chunk)
+                compressed_size = tmp.tell()
+                tmp.seek(0)
+                self.client.upload_fileobj(tmp, self.bucket, f'{o["Key"]}.gz')
+
+            self.client.delete_object(Bucket=self.bucket, Key=o['Key'])
+            saved += o['Size'] - compressed_size
+
+        return saved
+
+
+def artifact_store():
+    if ARTIFACT_STORE == 's3':
+        return S3Store(S3_BUCKET, WORK_DIR, S3_ENDPOINT_URL)
+
+    return LocalStore(ARTIFACT_DIR)
+
+
+store = artifact_store()
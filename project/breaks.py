@@ -0,0 +1,387 @@
+import math
+import os
+from functools import reduce
+
+import numpy as np
+import pandas as pd
+from billiard import Pool
+from ortools.sat.python import cp_model
+
+from validation import minutes
+from pruning import hh_mm
+from coverage import shift_starts, interval_counts
+from stopping import STOPPING_KEYS, stopping_options, solve
+
+# search time left to the planner's own breaks phase when breaks are placed here
+PLANNER_BREAKS_TIME = 1
+
+
+def breaks_options(profile):
+    return profile.get('breaks', {})
+
+
+def planner_breaks(profile):
+    # breaks section for the planner: with our engine its breaks phase only has to produce some placement
+    breaks = {k: v for k, v in breaks_options(profile).items() if k not in ['engine', 'num_workers', 'polish'] + STOPPING_KEYS}
+    if breaks_options(profile).get('engine', 'pyworkforce') != 'pyworkforce':
+        breaks['max_iteration_search_time'] = PLANNER_BREAKS_TIME
+
+    return breaks
+
+
+def shift_activities(meta):
+    # shift id -> its activities in the order they are placed, by the start of their windows
+    activities = {a['id']: a for a in meta['activities']}
+    return {
+        s['id']: sorted(
+            (activities[a] for a in s['activities'] if a in activities),
+            key=lambda a: (minutes(a['timeStart']), minutes(a['timeEndStart']))
+        )
+        for s in meta['shifts']
+    }
+
+
+def grid_minutes(meta, interval_minutes):
+    # the largest time step all shift & activity times are multiples of
+    values = [interval_minutes]
+    for s in meta['shifts']:
+        values += [minutes(s[k]) for k in ('duration', 'stepTime', 'scheduleTimeStart', 'minIntervalBetweenActivities', 'maxIntervalBetweenActivities')]
+    for a in meta['activities']:
+        values += [minutes(a[k]) for k in ('duration', 'timeStart', 'timeEndStart')]
+
+    return reduce(math.gcd, values)
+
+
+def grid_values(series, times, interval_minutes):
+    # values of an interval series at grid times, 0 outside of it
+    position = np.searchsorted(series.index.values, times.values, side='right') - 1
+    inside = (position >= 0) & (times.values < series.index.values[np.maximum(position, 0)] + np.timedelta64(interval_minutes, 'm'))
+
+    return np.where(inside, series.to_numpy()[np.maximum(position, 0)], 0)
+
+
+def day_pieces(rostering, meta, positions, interval_minutes, options, dates=None):
+    # one independent break placement problem per shift date (of dates, when given). a piece sees the demand
+    # of the intervals its shifts cover minus employees on shift from other dates (breaks of those not subtracted).
+    # times are in grid steps from the date's midnight, activity offsets from the shift start
+    schedule = rostering['campainSchedule']
+    shifts = {s['id']: s for s in meta['shifts']}
+    activities = shift_activities(meta)
+    grid = grid_minutes(meta, interval_minutes)
+
+    starts = shift_starts(schedule)
+    ends = starts + pd.to_timedelta([minutes(shifts[a['shiftId']]['duration']) for a in schedule], unit='m')
+    shift_dates = starts.dt.normalize()
+
+    pieces = []
+    for date in sorted(shift_dates.unique()):
+        if dates is not None and date not in dates:
+            continue
+
+        own = np.flatnonzero((shift_dates == date).to_numpy())
+        others = np.flatnonzero((shift_dates != date).to_numpy())
+
+        slots = int((ends.iloc[own].max() - date) / pd.Timedelta(minutes=grid))
+        times = pd.Series(pd.date_range(date, periods=slots, freq=f'{grid}min'))
+        grid_index = pd.DatetimeIndex(times)
+
+        need = grid_values(positions, times, interval_minutes) - interval_counts(grid_index, starts.iloc[others], ends.iloc[others])
+        on_shift = interval_counts(grid_index, starts.iloc[own], ends.iloc[own])
+
+        piece_shifts = []
+        for i in own:
+            a = schedule[i]
+            shift = shifts[a['shiftId']]
+            current = {x['activityId']: x['activityTimeStart'][:5] for x in a.get('activities', [])}
+            shift_minutes = minutes(a['shiftTimeStart'][:5])
+
+            piece_shifts.append({
+                'start': int((starts.iloc[i] - date) / pd.Timedelta(minutes=grid)),
+                'activities': [
+                    [
+                        minutes(x['timeStart']) // grid,
+                        (min(minutes(x['timeEndStart']), minutes(shift['duration']) - minutes(x['duration']))) // grid,
+                        math.ceil(minutes(x['duration']) / grid)
+                    ]
+                    for x in activities[a['shiftId']]
+                ],
+                'min_gap': math.ceil(minutes(shift['minIntervalBetweenActivities']) / grid),
+                'max_gap': minutes(shift['maxIntervalBetweenActivities']) // grid,
+                'current': [
+                    (minutes(current[x['id']]) - shift_minutes) % (24 * 60) // grid if x['id'] in current else None
+                    for x in activities[a['shiftId']]
+                ]
+            })
+
+        pieces.append({
+            'date': date.strftime('%d.%m.%y'),
+            'assignments': own.tolist(),
+            'grid': grid,
+            'need': need.tolist(),
+            'on_shift': on_shift.tolist(),
+            'shifts': piece_shifts,
+            'time_limit': options.get('max_iteration_search_time', 10),
+            'stopping': stopping_options(options)
+        })
+
+    return pieces
+
+
+def shortage(piece, offsets):
+    # intervals (in grid steps) short of employees with breaks at offsets, shifts without offsets keep current ones
+    available = np.array(piece['on_shift'])
+    for shift, shift_offsets in zip(piece['shifts'], offsets):
+        for (_, _, duration), offset in zip(shift['activities'], shift_offsets if shift_offsets is not None else shift['current']):
+            if offset is not None:
+                start = shift['start'] + offset
+                available[start:start + duration] -= 1
+
+    return int(np.clip(np.array(piece['need']) - available, 0, None).sum())
+
+
+def solve_day(piece):
+    # CP-SAT placement of all breaks of a day: one start per activity within its window,
+    # gaps between consecutive activities within the shift's min & max, least total shortage.
+    # shifts whose activities can't fit their windows & gaps keep their current placement
+    model = cp_model.CpModel()
+    slots = len(piece['need'])
+    covering = [[] for _ in range(slots)]
+    kept = np.zeros(slots, dtype=int)
+
+    choices = []
+    for shift in piece['shifts']:
+        if not placeable(shift):
+            for (_, _, duration), current in zip(shift['activities'], shift['current']):
+                if current is not None:
+                    kept[shift['start'] + current:shift['start'] + current + duration] += 1
+            choices.append(None)
+            continue
+
+        shift_choices = []
+        previous = None
+        for (low, high, duration), current in zip(shift['activities'], shift['current']):
+            x = {c: model.NewBoolVar('') for c in range(low, high + 1)}
+            model.AddExactlyOne(x.values())
+            start = sum(c * v for c, v in x.items())
+
+            for c, v in x.items():
+                for t in range(shift['start'] + c, min(shift['start'] + c + duration, slots)):
+                    covering[t].append(v)
+                if current is not None:
+                    model.AddHint(v, c == current)
+
+            if previous is not None:
+                gap = start - previous[0] - previous[1]
+                model.Add(gap >= shift['min_gap'])
+                model.Add(gap <= shift['max_gap'])
+
+            previous = (start, duration)
+            shift_choices.append(x)
+        choices.append(shift_choices)
+
+    short = []
+    for t in range(slots):
+        deficit = piece['need'][t] - piece['on_shift'][t] + int(kept[t])
+        if deficit + len(covering[t]) > 0:
+            s = model.NewIntVar(0, deficit + len(covering[t]), '')
+            model.Add(s >= deficit + sum(covering[t]))
+            short.append(s)
+    model.Minimize(sum(short))
+
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = piece['time_limit']
+    solver.parameters.num_search_workers = 1
+    status, reason = solve(solver, model, piece['stopping'])
+
+    offsets = None
+    if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        offsets = [
+            [next(c for c, v in x.items() if solver.Value(v)) for x in shift_choices] if shift_choices is not None else None
+            for shift_choices in choices
+        ]
+
+    return {'status': solver.StatusName(status), 'stop_reason': reason, 'offsets': offsets}
+
+
+def start_bounds(shift):
+    # earliest & latest start of every activity for which the rest of the chain still fits its windows and gaps
+    activities = shift['activities']
+    earliest = [low for low, _, _ in activities]
+    latest = [high for _, high, _ in activities]
+
+    for j in range(1, len(activities)):
+        earliest[j] = max(earliest[j], earliest[j - 1] + activities[j - 1][2] + shift['min_gap'])
+    for j in range(len(activities) - 2, -1, -1):
+        latest[j] = min(latest[j], latest[j + 1] - activities[j][2] - shift['min_gap'])
+        earliest[j] = max(earliest[j], earliest[j + 1] - activities[j][2] - shift['max_gap'])
+
+    return earliest, latest
+
+
+def placeable(shift):
+    earliest, latest = start_bounds(shift)
+    return all(low <= high for low, high in zip(earliest, latest))
+
+
+def move(slack, shift, offsets, change):
+    # slack of intervals shift activities at offsets cover, changed by change
+    for (_, _, duration), offset in zip(shift['activities'], offsets):
+        if offset is not None:
+            slack[shift['start'] + offset:shift['start'] + offset + duration] += change
+
+
+def place_shift(slack, shift, bounds):
+    # activities of a shift one after another, each where the summed slack over its duration is the largest;
+    # None when an activity has no start left within its window & gaps, slack is left as it was then
+    earliest, latest = bounds
+    cumulative = np.concatenate([[0], np.cumsum(slack)])
+
+    offsets = []
+    previous_end = None
+    for j, (_, _, duration) in enumerate(shift['activities']):
+        low, high = earliest[j], latest[j]
+        if previous_end is not None:
+            low = max(low, previous_end + shift['min_gap'])
+            high = min(high, previous_end + shift['max_gap'])
+        if high < low:
+            move(slack, shift, offsets, 1)
+            return None
+
+        first = np.clip(shift['start'] + np.arange(low, high + 1), 0, len(slack))
+        last = np.clip(first + duration, 0, len(slack))
+        scores = cumulative[last] - cumulative[first]
+
+        offset = low + int(np.argmax(scores))
+        slack[shift['start'] + offset:shift['start'] + offset + duration] -= 1
+        offsets.append(offset)
+        previous_end = offset + duration
+
+    return offsets
+
+
+def greedy_day(piece, passes=3):
+    # greedy placement into the largest coverage slack, shifts with the tightest windows first,
+    # then local search: every shift in turn gets its breaks taken out and placed again on what others left.
+    # shifts that can't be placed keep their current placement
+    slack = np.array(piece['on_shift'], dtype=float) - np.array(piece['need'], dtype=float)
+    shifts = piece['shifts']
+    bounds = [start_bounds(shift) for shift in shifts]
+    order = sorted(range(len(shifts)), key=lambda k: sum(h - l for l, h in zip(*bounds[k])))
+
+    offsets = [None] * len(shifts)
+    for k in order:
+        offsets[k] = place_shift(slack, shifts[k], bounds[k])
+        if offsets[k] is None:
+            move(slack, shifts[k], shifts[k]['current'], -1)
+
+    order = [k for k in order if offsets[k] is not None]
+    for _ in range(passes - 1):
+        for k in order:
+            move(slack, shifts[k], offsets[k], 1)
+            offsets[k] = place_shift(slack, shifts[k], bounds[k])
+
+    return {'status': 'GREEDY', 'stop_reason': 'completed', 'offsets': offsets}
+
+
+def polished_greedy_day(piece):
+    # greedy placement as the starting point of the CP-SAT model
+    greedy = greedy_day(piece)
+    polished = solve_day({
+        **piece, 'shifts': [{**s, 'current': o if o is not None else s['current']} for s, o in zip(piece['shifts'], greedy['offsets'])]
+    })
+
+    return polished if polished['offsets'] else greedy
+
+
+def day_solver(options):
+    if options.get('engine') == 'greedy':
+        return polished_greedy_day if options.get('polish', False) else greedy_day
+
+    return solve_day
+
+
+def apply_placements(rostering, meta, pieces, results):
+    # writes activities of solved pieces into the roster; a day keeps its placement if no better one was found.
+    # a day with activities missing in the roster has no placement to keep, shortage before it doesn't count them.
+    # shifts that couldn't be placed keep their activities and are counted as unplaceable
+    schedule = rostering['campainSchedule']
+    activities = shift_activities(meta)
+    report = []
+
+    for piece, result in zip(pieces, results):
+        before = shortage(piece, [shift['current'] for shift in piece['shifts']])
+        after = shortage(piece, result['offsets']) if result['offsets'] else before
+        complete = all(c is not None for shift in piece['shifts'] for c in shift['current'])
+        applied = result['offsets'] is not None and (after < before or not complete)
+
+        report.append({
+            'date': piece['date'],
+            'status': result['status'],
+            'stop_reason': result['stop_reason'],
+            'shortage_before': before,
+            'shortage': after if applied else before,
+            'unplaceable': sum(o is None for o in result['offsets']) if result['offsets'] is not None else 0
+        })
+        if not applied:
+            continue
+
+        for i, offsets in zip(piece['assignments'], result['offsets']):
+            if offsets is None:
+                continue
+            a = schedule[i]
+            start = minutes(a['shiftTimeStart'][:5])
+            a['activities'] = [
+                {
+                    'activityId': x['id'],
+                    'activityTimeStart': hh_mm(start + offset * piece['grid']),
+                    'activityTimeEnd': hh_mm(start + offset * piece['grid'] + minutes(x['duration']))
+                }
+                for x, offset in zip(activities[a['shiftId']], offsets)
+            ]
+
+    return report
+
+
+def place_breaks(rostering, meta, positions, interval_minutes, options):
+    # re-places activities of a fixed roster day by day with the engine of the profile,
+    # the days are solved in parallel processes
+    pieces = day_pieces(rostering, meta, positions, interval_minutes, options)
+
+    pool = Pool(options.get('num_workers', os.cpu_count()))
+    try:
+        results = pool.map(day_solver(options), pieces)
+    finally:
+        pool.close()
+        pool.join()
+
+    return (rostering, apply_placements(rostering, meta, pieces, results))
+
+
+def freeze_started(piece, cutoff):
+    # activities started before cutoff keep their place, the rest may only move to cutoff or later.
+    # an activity whose window closed before cutoff gets an empty window: its shift keeps its placement
+    # and is reported unplaceable
+    cutoff_step = math.ceil((cutoff - pd.to_datetime(piece['date'], format='%d.%m.%y')) / pd.Timedelta(minutes=piece['grid']))
+
+    shifts = []
+    for shift in piece['shifts']:
+        activities = []
+        for (low, high, duration), current in zip(shift['activities'], shift['current']):
+            if current is not None and shift['start'] + current < cutoff_step:
+                low = high = current
+            else:
+                low = max(low, cutoff_step - shift['start'])
+            activities.append([low, high, duration])
+        shifts.append({**shift, 'activities': activities})
+
+    return {**piece, 'shifts': shifts}
+
+
+def replan_day(rostering, meta, positions, interval_minutes, cutoff, options):
+    # intraday re-placement of activities of shifts starting on the cutoff's date that haven't started yet,
+    # solved in this process: greedy placement polished by CP-SAT within the time limit
+    pieces = day_pieces(rostering, meta, positions, interval_minutes, options, dates=[cutoff.normalize()])
+    pieces = [freeze_started(piece, cutoff) for piece in pieces]
+    results = [polished_greedy_day(piece) for piece in pieces]
+
+    return (rostering, apply_placements(rostering, meta, pieces, results))
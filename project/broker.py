@@ -0,0 +1,5 @@
+import os
+
+import redis
+
+redis_client = redis.Redis.from_url(os.environ.get("CELERY_BROKER_URL", "redis://localhost:6379"))
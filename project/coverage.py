@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+
+from validation import minutes
+
+
+def shift_starts(assignments):
+    # shift start datetimes (campaign time) of rostering assignments
+    return pd.to_datetime(
+        pd.Series([f"{a['shiftDate']} {a['shiftTimeStart'][:5]}" for a in assignments], dtype=object),
+        format='%d.%m.%y %H:%M'
+    )
+
+
+def interval_counts(index, starts, ends):
+    # number of [start, end) ranges covering every interval of a regular index, by difference array
+    edges = np.zeros(len(index) + 1, dtype=int)
+    np.add.at(edges, np.searchsorted(index.values, np.asarray(starts, dtype='datetime64[ns]')), 1)
+    np.add.at(edges, np.searchsorted(index.values, np.asarray(ends, dtype='datetime64[ns]')), -1)
+
+    return np.cumsum(edges)[:-1]
+
+
+def gross_coverage(assignments, meta, index):
+    # employees on shift per interval of the index, breaks not subtracted
+    if not assignments:
+        return pd.Series(0, index=index)
+
+    durations = {s['id']: minutes(s['duration']) for s in meta['shifts']}
+
+    starts = shift_starts(assignments)
+    ends = starts + pd.to_timedelta([durations[a['shiftId']] for a in assignments], unit='m')
+
+    return pd.Series(interval_counts(index, starts, ends), index=index)
+
+
+def activity_ranges(assignments):
+    # start & end datetimes of all activities of rostering assignments,
+    # activity times before the shift start belong to the next day
+    rows = [
+        (a['shiftDate'], a['shiftTimeStart'], x['activityTimeStart'], x['activityTimeEnd'])
+        for a in assignments for x in a.get('activities', [])
+    ]
+    if not rows:
+        return pd.Series([], dtype='datetime64[ns]'), pd.Series([], dtype='datetime64[ns]')
+
+    # dates & times repeat a lot, each distinct string is parsed once
+    dates, shift_times, start_times, end_times = [pd.factorize(np.array(column, dtype=object)) for column in zip(*rows)]
+    dates = pd.Series(pd.to_datetime(dates[1], format='%d.%m.%y')[dates[0]])
+    shift_minutes, start_minutes, end_minutes = [
+        np.array([minutes(t[:5]) for t in uniques])[codes] for codes, uniques in (shift_times, start_times, end_times)
+    ]
+
+    end_minutes = start_minutes + (end_minutes - start_minutes) % (24 * 60)
+    next_day = np.where(start_minutes < shift_minutes, 24 * 60, 0)
+
+    return dates + pd.to_timedelta(start_minutes + next_day, unit='m'), dates + pd.to_timedelta(end_minutes + next_day, unit='m')
+
+
+def net_coverage(assignments, meta, index):
+    # employees on shift and not on an activity (lunch, break) per interval of the index
+    starts, ends = activity_ranges(assignments)
+
+    return gross_coverage(assignments, meta, index) - interval_counts(index, starts, ends)
+
+
+def coverage_by_shift(assignments, meta, index):
+    # employees on shift and productive (on shift, not on an activity) per interval,
+    # by shift and utc zone of employees, in long format. times are parsed once for all groups
+    if not assignments:
+        return pd.DataFrame({'tc': index[:0], 'shiftId': [], 'utc': [], 'on_shift': [], 'works': []})
+
+    employee_utc = {e['id']: e['utc'] for e in meta['employees']}
+    durations = {s['id']: minutes(s['duration']) for s in meta['shifts']}
+
+    codes, groups = pd.factorize(pd.Series([(a['shiftId'], employee_utc.get(a['employeeId'])) for a in assignments]))
+    activity_codes = np.repeat(codes, [len(a.get('activities', [])) for a in assignments])
+
+    starts = shift_starts(assignments)
+    ends = starts + pd.to_timedelta([durations[a['shiftId']] for a in assignments], unit='m')
+    activity_starts, activity_ends = activity_ranges(assignments)
+
+    frames = []
+    for g, (shift_id, utc) in enumerate(groups):
+        on_shift = interval_counts(index, starts[codes == g], ends[codes == g])
+        on_activity = interval_counts(index, activity_starts[activity_codes == g], activity_ends[activity_codes == g])
+        frames.append(pd.DataFrame({'tc': index, 'shiftId': shift_id, 'utc': utc, 'on_shift': on_shift, 'works': np.maximum(on_shift - on_activity, 0)}))
+
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,97 @@
+import os
+import uuid
+import hashlib
+
+from celery.result import AsyncResult
+from redis.exceptions import WatchError
+import pyworkforce as pw
+
+from broker import redis_client
+
+DEDUP_TTL = int(os.environ.get("DEDUP_TTL", 24 * 60 * 60))
+
+INFLIGHT_KEY = "dedup:inflight:{}"
+HANDLE_KEY = "dedup:handle:{}"
+REFS_KEY = "dedup:refs:{}"
+
+
+def content_key(*contents):
+    # same inputs solved by another library version may give another result
+    h = hashlib.sha256(pw.__version__.encode())
+    for content in contents:
+        h.update(len(content).to_bytes(8, 'big'))
+        h.update(content)
+
+    return h.hexdigest()
+
+
+def find_inflight(key):
+    task_id = redis_client.get(INFLIGHT_KEY.format(key))
+    if task_id is None:
+        return None
+
+    task_id = task_id.decode()
+    if AsyncResult(task_id).ready():
+        return None
+
+    return task_id
+
+
+def claim(key, task_id):
+    # makes task_id the in-flight task of key unless an unfinished task holds it, returns the one holding it.
+    # SET NX is atomic, so of concurrent identical submits exactly one claims the key;
+    # a key held by a finished task is taken over only while it still holds it
+    name = INFLIGHT_KEY.format(key)
+    while True:
+        if redis_client.set(name, task_id, nx=True, ex=DEDUP_TTL):
+            return task_id
+
+        holder = find_inflight(key)
+        if holder is not None:
+            return holder
+
+        with redis_client.pipeline() as pipe:
+            try:
+                pipe.watch(name)
+                current = pipe.get(name)
+                if current is not None and not AsyncResult(current.decode()).ready():
+                    continue
+                pipe.multi()
+                pipe.set(name, task_id, ex=DEDUP_TTL)
+                pipe.execute()
+                return task_id
+            except WatchError:
+                continue
+
+
+def track(task_id):
+    # the submission that started a task holds a reference to it, as the ones attached do
+    redis_client.sadd(REFS_KEY.format(task_id), task_id)
+    redis_client.expire(REFS_KEY.format(task_id), DEDUP_TTL)
+
+
+def attach(task_id):
+    # references live as long as the newest submission of a task
+    handle = str(uuid.uuid4())
+    redis_client.set(HANDLE_KEY.format(handle), task_id, ex=DEDUP_TTL)
+    redis_client.sadd(REFS_KEY.format(task_id), handle)
+    redis_client.expire(REFS_KEY.format(task_id), DEDUP_TTL)
+
+    return handle
+
+
+def resolve(id):
+    # handle of a coalesced submission or a task id itself
+    task_id = redis_client.get(HANDLE_KEY.format(id))
+    if task_id is None:
+        return id
+
+    return task_id.decode()
+
+
+def release(id):
+    # returns underlying task id and number of handles still waiting for it
+    task_id = resolve(id)
+    redis_client.srem(REFS_KEY.format(task_id), id)
+
+    return (task_id, redis_client.scard(REFS_KEY.format(task_id)))
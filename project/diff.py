@@ -0,0 +1,49 @@
+def assignment_key(a):
+    return (str(a['employeeId']), a['shiftDate'])
+
+
+def activity_times(a):
+    return {x['activityId']: [x['activityTimeStart'], x['activityTimeEnd']] for x in a.get('activities', [])}
+
+
+def roster_diff(base, rostering):
+    # changes from base to rostering by a hash join on (employee, shift date), linear in the number of assignments:
+    # assignments added or removed, moved to another shift or start, and activities moved within an unchanged shift
+    before = {assignment_key(a): a for a in base['campainSchedule']}
+
+    added = []
+    moved = []
+    activities = []
+    matched = set()
+    for a in rostering['campainSchedule']:
+        key = assignment_key(a)
+        b = before.get(key)
+        if b is None:
+            added.append(a)
+            continue
+
+        matched.add(key)
+        if (b['shiftId'], b['shiftTimeStart']) != (a['shiftId'], a['shiftTimeStart']):
+            moved.append({'before': b, 'after': a})
+            continue
+
+        times_before, times_after = activity_times(b), activity_times(a)
+        for activity_id in sorted(times_before.keys() | times_after.keys()):
+            if times_before.get(activity_id) != times_after.get(activity_id):
+                activities.append({
+                    'employeeId': a['employeeId'],
+                    'shiftDate': a['shiftDate'],
+                    'activityId': activity_id,
+                    'before': times_before.get(activity_id),
+                    'after': times_after.get(activity_id)
+                })
+
+    removed = [b for key, b in before.items() if key not in matched]
+
+    return {
+        'summary': {'added': len(added), 'removed': len(removed), 'moved': len(moved), 'activities': len(activities)},
+        'added': added,
+        'removed': removed,
+        'moved': moved,
+        'activities': activities
+    }
@@ -0,0 +1,173 @@
+import json
+import math
+import hashlib
+from pathlib import Path
+
+import pandas as pd
+
+from reroster import parse_date, paid_hours
+
+
+def windows(dates, window_days, overlap_days):
+    # (dates to keep, dates to solve) of every window; a window is solved together with
+    # the overlap that follows it, so its last days are planned knowing what comes next
+    result = []
+    for i in range(0, len(dates), window_days):
+        result.append((dates[i:i + window_days], dates[i:i + window_days + overlap_days]))
+
+    return result
+
+
+def boundary_state(schedule, last_date, hours):
+    # (days worked in a row, days of rest in a row, hours worked) at the end of committed days
+    worked_dates = set(parse_date(a['shiftDate']) for a in schedule)
+
+    worked, rest = 0, 0
+    day = last_date
+    while day in worked_dates:
+        worked += 1
+        day -= pd.Timedelta(days=1)
+    if worked == 0:
+        while day not in worked_dates and rest < 31:
+            rest += 1
+            day -= pd.Timedelta(days=1)
+
+    return (worked, rest, sum(hours[a['shiftId']] for a in schedule))
+
+
+def forbidden_days(schema, state, solve_dates):
+    # window days an employee can't work to respect runs that started in previous windows:
+    # a rest day is forced before the work run exceeds its max, and a rest run is kept up to its min
+    worked, rest, _ = state
+    work_max = max(s['maxDaysInRow'] for s in schema['shifts'])
+    rest_min = schema['holidays']['minDaysInRow']
+
+    forbidden = set()
+    if worked > 0 and work_max - worked < len(solve_dates):
+        forbidden.add(solve_dates[max(work_max - worked, 0)].day)
+    if 0 < rest < rest_min:
+        forbidden |= set(d.day for d in solve_dates[:rest_min - rest])
+
+    return forbidden
+
+
+def window_meta(meta, states, solve_dates, remaining_days, hours):
+    # meta of a window: hours left are spread over the rest of horizon proportionally to window length,
+    # employees with boundary restrictions get own copies of their schemas.
+    # a prorated band is rarely a whole number of shifts wide, so inner windows get a band one longest
+    # shift wider on each side, and the last window gets the hours left exactly.
+    # returns the meta and employees whose hours left can't be worked in the last window
+    schemas = {s['id']: s for s in meta['schemas']}
+    share = min(len(solve_dates) / remaining_days, 1.0)
+
+    window_schemas = {}
+    employees = []
+    shortfall = []
+    for e in meta['employees']:
+        state = states.get(e['id'], (0, 0, 0))
+        worked_hours = state[2]
+
+        employee_schemas = []
+        for schema_id in e['schemas']:
+            schema = schemas[schema_id]
+            forbidden = forbidden_days(schema, state, solve_dates)
+            if forbidden:
+                key = hashlib.sha256(json.dumps(sorted(forbidden)).encode()).hexdigest()[:8]
+                schema_id = f'{schema_id}~{key}'
+                schema = {
+                    **schema,
+                    'id': schema_id,
+                    'shifts': [{**ss, 'days': [d for d in ss['days'] if d not in forbidden]} for ss in schema['shifts']]
+                }
+            window_schemas[schema_id] = schema
+            employee_schemas.append(schema_id)
+
+        longest = max((hours.get(ss['shiftId'], 0) for s in e['schemas'] for ss in schemas[s]['shifts']), default=0)
+        min_hours = max(e['minWorkingHours'] - worked_hours, 0)
+        max_hours = max(e['maxWorkingHours'] - worked_hours, 0)
+
+        if share < 1.0:
+            min_hours, max_hours = max(min_hours * share - longest, 0), min(max_hours * share + longest, max_hours)
+        else:
+            # at most one shift a day
+            achievable = len(solve_dates) * longest
+            if min_hours > achievable:
+                shortfall.append({'employeeId': e['id'], 'hoursLeft': round(min_hours, 2), 'achievable': round(achievable, 2)})
+                min_hours = achievable
+
+        employees.append({
+            **e,
+            'schemas': employee_schemas,
+            'minWorkingHours': math.floor(min_hours),
+            'maxWorkingHours': math.ceil(max_hours)
+        })
+
+    return {**meta, 'schemas': list(window_schemas.values()), 'employees': employees}, shortfall
+
+
+def commit_csv(window_dir, output_dir, commit_dates):
+    # interval outputs of a window (statistics, quantiles) are appended for the kept days only
+    for path in Path(window_dir).glob('*.csv'):
+        df = pd.read_csv(path)
+        if 'tc' not in df.columns:
+            continue
+        df = df[pd.to_datetime(df['tc']).dt.date.isin(commit_dates)]
+
+        target = Path(output_dir) / path.name
+        df.to_csv(target, mode='a', header=not target.exists(), index=False)
+
+
+def solve_rolling_horizon(df, meta, options, output_dir, solve):
+    # solves the horizon window by window, every window starts from the state the previous ones left:
+    # days worked / rested in a row and hours worked so far. solve(df, meta, output_dir) runs the planner
+    window_days = min(max(options.get('window_days', 7), 1), 28)
+    overlap_days = min(max(options.get('overlap_days', 2), 0), 28 - window_days)
+
+    dates = sorted(set(df.index.date))
+    hours = paid_hours(meta)
+
+    schedule = []
+    statistics = []
+    states = {}
+    report = []
+    rostering = None
+
+    parts = windows(dates, window_days, overlap_days)
+    for i, (commit_dates, solve_dates) in enumerate(parts):
+        window_dir = f'{output_dir}/window_{i}'
+        Path(window_dir).mkdir(parents=True, exist_ok=True)
+
+        remaining_days = len(dates) - dates.index(solve_dates[0])
+        solve_meta, shortfall = window_meta(meta, states, solve_dates, remaining_days, hours)
+        if shortfall:
+            report.append({'window': i, 'shortfall': shortfall})
+        solve(df[pd.Series(df.index.date, index=df.index).isin(solve_dates)], solve_meta, window_dir)
+
+        with open(f'{window_dir}/rostering.json', 'r', encoding='utf-8') as f:
+            rostering = json.load(f)
+        kept = set(commit_dates)
+        schedule += [a for a in rostering['campainSchedule'] if parse_date(a['shiftDate']) in kept]
+
+        stats_path = Path(f'{window_dir}/statistics_output.json')
+        if stats_path.exists():
+            with open(stats_path, 'r', encoding='utf-8') as f:
+                stats = json.load(f)
+            statistics += [r for r in stats if pd.Timestamp(r['tc']).date() in kept]
+
+        commit_csv(window_dir, output_dir, commit_dates)
+
+        by_employee = {}
+        for a in schedule:
+            by_employee.setdefault(a['employeeId'], []).append(a)
+        states = {e: boundary_state(s, commit_dates[-1], hours) for e, s in by_employee.items()}
+
+    with open(f'{output_dir}/rostering.json', 'w', encoding='utf-8') as f:
+        json.dump({**rostering, 'campainSchedule': schedule}, f, ensure_ascii=False)
+
+    if statistics:
+        with open(f'{output_dir}/statistics_output.json', 'w', encoding='utf-8') as f:
+            json.dump(statistics, f, ensure_ascii=False)
+
+    # employees whose min working hours were lowered in the last window, they end the horizon short
+    with open(f'{output_dir}/horizon.json', 'w', encoding='utf-8') as f:
+        json.dump({'windows': len(parts), 'shortfall': report}, f, ensure_ascii=False)
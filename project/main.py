@@ -1,17 +1,32 @@
+import json
+import uuid
 from celery.result import AsyncResult
-from fastapi import FastAPI, File, UploadFile
+from fastapi import FastAPI, File, UploadFile, Header, Query, Request
 from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import StreamingResponse
-from typing import Any, Callable, Set, TypeVar
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from typing import Any, Callable, Optional, Set, TypeVar
 from fastapi.openapi.utils import generate_operation_id
 from fastapi.routing import APIRoute
-from pathlib import Path
+from io import BytesIO
+import pandas as pd
 import pyworkforce as pw
 from version import __version__
 
-from worker import create_task, terminate_task
+from admission import AdmissionRejected, admit, admitted, register, queue_position
+from dedup import content_key, find_inflight, claim, track, attach, resolve, release
+from validation import validate, parse_data, parse_data_update, parse_meta, parse_profile, check_rostering
+from staffing import required_positions, interval_seconds
+from roster_statistics import roster_statistics
+from quantiles import SHIFT_QUANTILES_FILE
+from breaks import replan_day
+from artifacts import PIN, store
+from registry import task_size, record_submit, sync, list_tasks
+from result_formats import RESULT_FILES, RESULT_MEDIA_TYPES, RESULT_HEADER_FILE, result_file, campain_utc
+from diff import roster_diff
+from result_index import RESULT_INDEX_FILE, result_index, employee_assignments, day_assignments
+from worker import create_task, reroster_task, terminate_task
 
 app = FastAPI()
 
@@ -39,6 +54,10 @@ def remove_422s(app: FastAPI) -> None:
                 metadata["responses"].pop("422", None)
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
+
+@app.on_event("startup")
+def prepare_store():
+    store.prepare()
 templates = Jinja2Templates(directory="templates")
 
 @app.get('/health', responses={
@@ -73,13 +92,41 @@ def iterfile(path):
     with open(path, mode="rb") as file_like:
         yield from file_like
 
+def stream_artifact(task_id, name):
+    stream = store.stream(task_id, name)
+    if stream is None:
+        return JSONResponse(status_code=404)
+    return StreamingResponse(stream, media_type="application/octet-stream")
+
+def local_artifact(task_id, name, source='rostering.json'):
+    # local directory with a copy of a task artifact; artifacts derived from the result,
+    # that older tasks don't have, get derived from a local copy of the result
+    store.evict()
+    task_dir = store.fetch(task_id, [name])
+    if not (task_dir / name).exists():
+        store.fetch(task_id, [source])
+    return task_dir
+
+def result_campain_utc(task_id):
+    # from the small header artifact; results finished before it was written have it in the parquet metadata
+    stream = store.stream(task_id, RESULT_HEADER_FILE)
+    if stream is not None:
+        return json.loads(b''.join(stream))['campainUtc']
+    return campain_utc(result_file(local_artifact(task_id, RESULT_FILES['parquet']), 'parquet'))
+
 @app.post("/task", status_code=201, responses={
     201: {
         "content": {
             "application/json": {
-                "example": {"id": "08234f72-29c9-4527-861c-b3d29aabf0e4"}
+                "example": {
+                    "id": "08234f72-29c9-4527-861c-b3d29aabf0e4",
+                    "position": 2,
+                    "eta": "2023-03-01T10:15:00+00:00"
+                    }
             }},
-        "description": "Return task id"
+        "description": "Return task id, number of tasks ahead in the queue and estimated start time. "
+                       "If the same inputs are already queued or solving, return a handle to that task instead, "
+                       "with the number of tasks ahead of that task and its estimated start time (now, when it's solving)"
     },
     422: {
             "content": {
@@ -87,25 +134,393 @@ def iterfile(path):
                 "example": {"detail":[{"loc":["body","solver_profile_file"],"msg":"field required","type":"value_error.missing"}]}
             }},
         "description": "Validates input files"
+    },
+    400: {
+        "content": {
+            "application/json": {
+                "example": {"detail":[{"loc":["meta_file","employees",0,"schemas"],"msg":"unknown schema 'MS_9h'","type":"value_error.reference"}]}
+            }},
+        "description": "Solver profile can't be parsed, preflight validation failed (only when preflight is requested)"
+    },
+    429: {
+        "content": {
+            "application/json": {
+                "example": {"detail": "Queue is full: 20 tasks queued or running"}
+            }},
+        "description": "Too many queued tasks, retry after the number of seconds in Retry-After header"
     }
 })
 
 def submit_task(
+    request: Request,
     data_file: UploadFile = File(..., description="Comma separated csv file with columns: tc,call_volume,aht,service_level,art"),
     meta_file: UploadFile = File(..., description="Json meta file that contains: activities, shifts, schemas and eployees"),
-    solver_profile_file: UploadFile = File(..., description="Execution parameters for: scheduling, rostering, breaks")
+    solver_profile_file: UploadFile = File(..., description="Execution parameters for: scheduling, rostering, breaks"),
+    x_client_id: Optional[str] = Header(None, description="Client identifier used for per-client quotas, defaults to client host"),
+    preflight: bool = False
+):
+    client_id = x_client_id or request.client.host
+    data = data_file.file.read()
+    meta = meta_file.file.read()
+    profile = solver_profile_file.file.read()
+
+    try:
+        parsed_profile, errors = parse_profile(profile)
+    except Exception as e:
+        errors = [{"loc": ["solver_profile_file"], "msg": f"can't be parsed: {e}", "type": "value_error.json"}]
+    if errors:
+        return JSONResponse({"detail": errors}, status_code=400)
+
+    if preflight:
+        errors, _ = validate(data, meta)
+        if errors:
+            return JSONResponse({"detail": errors}, status_code=400)
+
+    size = task_size(data, meta)
+    key = content_key(data, meta, profile)
+    task_id = None
+    inflight_id = find_inflight(key)
+    if inflight_id is None:
+        try:
+            position, eta = admit(client_id)
+        except AdmissionRejected as e:
+            return JSONResponse({"detail": e.reason}, status_code=429, headers={"Retry-After": str(e.retry_after)})
+
+        # of concurrent identical submits one claims the key, the others attach to its task
+        task_id = str(uuid.uuid4())
+        inflight_id = claim(key, task_id)
+
+    if inflight_id != task_id:
+        position, eta = queue_position(inflight_id)
+        return JSONResponse({"id": attach(inflight_id), "position": position, "eta": eta.isoformat()}, status_code=201)
+
+    # inputs are stored per task, so concurrent submits can't overwrite each other
+    store.put(task_id, 'input', BytesIO(data))
+    store.put(task_id, 'meta', BytesIO(meta))
+    store.put(task_id, 'profile', BytesIO(profile))
+
+    task = create_task.apply_async(task_id=task_id)
+    track(task.id)
+    register(task.id, client_id)
+
+    inputs = {'input': data, 'meta': meta, 'profile': profile}
+    record_submit(task.id, 'create', client_id, inputs, parsed_profile, size)
+
+    return JSONResponse({"id": task.id, "position": position, "eta": eta.isoformat()}, status_code=201)
+
+@app.post("/validate", responses={
+    200: {
+        "content": {
+            "application/json": {
+                "example": {
+                    "valid": False,
+                    "errors": [{"loc":["meta_file","employees",1,"minWorkingHours"],"msg":"employee 692: min working hours 300 > achievable 234","type":"value_error.infeasible"}],
+                    "warnings": [{"loc":["data_file"],"msg":"peak of 576 required positions at 2022-12-30 12:00:00 > 375 employees","type":"value_error.capacity"}]
+                    }
+            }},
+        "description": "Return errors that make inputs infeasible and warnings about insufficient capacity"
+    }
+})
+def validate_task(
+    data_file: UploadFile = File(..., description="Comma separated csv file with columns: tc,call_volume,aht,service_level,art"),
+    meta_file: UploadFile = File(..., description="Json meta file that contains: activities, shifts, schemas and eployees")
+):
+    errors, warnings = validate(data_file.file.read(), meta_file.file.read())
+    return JSONResponse({"valid": not errors, "errors": errors, "warnings": warnings})
+
+@app.post("/staffing", responses={
+    200: {
+        "content": {
+            "application/json": {
+                "example": {
+                    "tc": ["2023-03-01 00:00:00", "2023-03-01 00:15:00"],
+                    "positions": [6, 5],
+                    "zero_level_positions": [2, 2]
+                    }
+            },
+            "text/csv": {
+                "example": "tc,positions,zero_level_positions\n2023-03-01 00:00:00,6,2\n2023-03-01 00:15:00,5,2\n"
+            }},
+        "description": "Return Erlang C required positions and zero level positions per interval"
+    },
+    400: {
+        "content": {
+            "application/json": {
+                "example": {"detail":[{"loc":["data_file"],"msg":"missing columns: aht","type":"value_error.missing"}]}
+            }},
+        "description": "Data file can't be parsed"
+    }
+})
+def get_staffing(
+    data_file: UploadFile = File(..., description="Comma separated csv file with columns: tc,call_volume,aht,service_level,art"),
+    format: str = Query("json", regex="^(json|csv)$", description="Columnar json or csv")
+):
+    try:
+        df, errors = parse_data(data_file.file.read())
+    except Exception as e:
+        errors = [{"loc": ["data_file"], "msg": f"can't be parsed: {e}", "type": "value_error.csv"}]
+    if errors:
+        return JSONResponse({"detail": errors}, status_code=400)
+
+    staffing = required_positions(df)
+    staffing.index = staffing.index.strftime('%Y-%m-%d %H:%M:%S')
+    staffing.index.name = 'tc'
+
+    if format == 'csv':
+        return PlainTextResponse(staffing.to_csv(), media_type="text/csv")
+
+    result = {'tc': list(staffing.index)}
+    result.update({c: staffing[c].tolist() for c in staffing.columns})
+    return JSONResponse(result)
+
+@app.post("/service-level", responses={
+    200: {
+        "content": {
+            "application/json": {
+                "example": {
+                    "tc": ["2023-03-01 00:00:00", "2023-03-01 00:15:00"],
+                    "positions": [6, 5],
+                    "scheduled_positions": [7, 4],
+                    "scheduled_service_level": [91.3, 62.8],
+                    "scheduled_art": [4.1, 27.5]
+                    }
+            },
+            "text/csv": {
+                "example": "tc,call_volume,aht,service_level,art,positions,scheduled_positions,scheduled_service_level,scheduled_art\n"
+            }},
+        "description": "Return service level and answer time a roster reaches per interval, breaks subtracted"
+    },
+    400: {
+        "content": {
+            "application/json": {
+                "example": {"detail":[{"loc":["rostering_file","campainSchedule",12,"shiftId"],"msg":"unknown shift '9h day'","type":"value_error.reference"}]}
+            }},
+        "description": "Input files can't be parsed or the roster refers to shifts, employees or activities not in meta"
+    }
+})
+def get_service_level(
+    data_file: UploadFile = File(..., description="Comma separated csv file with columns: tc,call_volume,aht,service_level,art"),
+    meta_file: UploadFile = File(..., description="Json meta file that contains: activities, shifts, schemas and eployees"),
+    rostering_file: UploadFile = File(..., description="Rostering json, e.g. a task result edited by planners"),
+    format: str = Query("json", regex="^(json|csv)$", description="Columnar json or csv")
+):
+    try:
+        df, errors = parse_data(data_file.file.read())
+    except Exception as e:
+        errors = [{"loc": ["data_file"], "msg": f"can't be parsed: {e}", "type": "value_error.csv"}]
+    try:
+        meta, meta_errors = parse_meta(meta_file.file.read())
+        errors += meta_errors
+    except Exception as e:
+        errors.append({"loc": ["meta_file"], "msg": f"can't be parsed: {e}", "type": "value_error.json"})
+    try:
+        rostering = json.loads(rostering_file.file.read())
+        rostering['campainSchedule']
+    except Exception as e:
+        errors.append({"loc": ["rostering_file"], "msg": f"can't be parsed: {e}", "type": "value_error.json"})
+    if errors:
+        return JSONResponse({"detail": errors}, status_code=400)
+
+    try:
+        errors = check_rostering(rostering, meta)
+    except (KeyError, TypeError, AttributeError) as e:
+        errors = [{"loc": ["rostering_file"], "msg": f"malformed: {e}", "type": "value_error.json"}]
+    if errors:
+        return JSONResponse({"detail": errors}, status_code=400)
+
+    stats = roster_statistics(df, rostering, meta)
+    stats.index = stats.index.strftime('%Y-%m-%d %H:%M:%S')
+    stats.index.name = 'tc'
+
+    if format == 'csv':
+        return PlainTextResponse(stats.to_csv(), media_type="text/csv")
+
+    # answer time is unknown where the queue isn't stable
+    stats = stats.astype(object).where(stats.notna(), None)
+    result = {'tc': list(stats.index)}
+    result.update({c: stats[c].tolist() for c in stats.columns})
+    return JSONResponse(result)
+
+@app.post("/task/{id}/reroster", status_code=201, responses={
+    201: {
+        "content": {
+            "application/json": {
+                "example": {
+                    "id": "08234f72-29c9-4527-861c-b3d29aabf0e4",
+                    "position": 0,
+                    "eta": "2023-03-01T10:15:00+00:00"
+                    }
+            }},
+        "description": "Return id of a re-roster task"
+    },
+    400: {
+        "content": {
+            "application/json": {
+                "example": {"detail":[{"loc":["solver_profile_file"],"msg":"can't be parsed: Expecting value: line 1 column 1 (char 0)","type":"value_error.json"}]}
+            }},
+        "description": "Solver profile can't be parsed"
+    },
+    404: {
+        "description": "Task with provided id not found or has no result"
+    },
+    429: {
+        "description": "Too many queued tasks, retry after the number of seconds in Retry-After header"
+    }
+})
+def submit_reroster(
+    id,
+    request: Request,
+    delta_file: UploadFile = File(..., description="Json with changeDate (dd.mm.yy), added & modified employees, removed employee ids and frozenDays"),
+    solver_profile_file: Optional[UploadFile] = File(None, description="Execution parameters, the ones of the base task by default"),
+    x_client_id: Optional[str] = Header(None, description="Client identifier used for per-client quotas, defaults to client host")
+):
+    client_id = x_client_id or request.client.host
+    base_id = resolve(id)
+    if not store.exists(base_id, 'rostering.json'):
+        return JSONResponse(status_code=404)
+
+    profile = solver_profile_file.file.read() if solver_profile_file is not None else None
+    parsed_profile = None
+    if profile:
+        try:
+            parsed_profile, errors = parse_profile(profile)
+        except Exception as e:
+            errors = [{"loc": ["solver_profile_file"], "msg": f"can't be parsed: {e}", "type": "value_error.json"}]
+        if errors:
+            return JSONResponse({"detail": errors}, status_code=400)
+
+    try:
+        position, eta = admit(client_id)
+    except AdmissionRejected as e:
+        return JSONResponse({"detail": e.reason}, status_code=429, headers={"Retry-After": str(e.retry_after)})
+
+    task_id = str(uuid.uuid4())
+    for name in ['input', 'meta', 'profile']:
+        store.copy(base_id, name, task_id)
+
+    if profile:
+        store.put(task_id, 'profile', BytesIO(profile))
+
+    delta = delta_file.file.read()
+    store.put(task_id, 'delta', BytesIO(delta))
+
+    task = reroster_task.apply_async(args=[base_id], task_id=task_id)
+    register(task.id, client_id)
+
+    inputs = {'delta': delta}
+    if profile:
+        inputs['profile'] = profile
+    record_submit(task.id, 'reroster', client_id, inputs, parsed_profile, base_id=base_id)
+
+    return JSONResponse({"id": task.id, "position": position, "eta": eta.isoformat()}, status_code=201)
+
+@app.post("/task/{id}/intraday", responses={
+    200: {
+        "content": {
+            "application/json": {
+                "example": {
+                    "date": "01.03.23",
+                    "cutoff": "2023-03-01 12:00:00",
+                    "report": [{"date": "01.03.23", "status": "OPTIMAL", "stop_reason": "optimal", "shortage_before": 41, "shortage": 36}],
+                    "campainSchedule": [{"employeeId": "1", "shiftId": "Day", "shiftDate": "01.03.23", "shiftTimeStart": "09:00",
+                                         "activities": [{"activityId": "lunch", "activityTimeStart": "13:15", "activityTimeEnd": "13:45"}]}]
+                    }
+            }},
+        "description": "Return the cutoff day's assignments with not yet started activities re-placed, the task result isn't changed"
+    },
+    400: {
+        "content": {
+            "application/json": {
+                "example": {"detail":[{"loc":["cutoff"],"msg":"can't be parsed","type":"type_error.datetime"}]}
+            }},
+        "description": "Cutoff or data file can't be parsed"
+    },
+    404: {
+        "description": "Task with provided id not found or has no result"
+    }
+})
+def replan_intraday(
+    id,
+    cutoff: str = Query(..., description="Campaign time activities starting before which are kept, e.g. 2023-03-01 12:00"),
+    time_limit: float = Query(3, gt=0, le=10, description="Seconds to search for a better placement"),
+    data_file: Optional[UploadFile] = File(None, description="Comma separated csv file with tc and updated columns of the task input: call_volume,aht,service_level,art")
 ):
-    with open("./tmp/data", "wb") as f:
-        f.write(data_file.file.read())
+    base_id = resolve(id)
+    if not store.exists(base_id, 'rostering.json'):
+        return JSONResponse(status_code=404)
 
-    with open("./tmp/meta", "wb") as f:
-        f.write(meta_file.file.read())
+    errors = []
+    try:
+        cutoff = pd.Timestamp(cutoff)
+    except Exception:
+        errors.append({"loc": ["cutoff"], "msg": "can't be parsed", "type": "type_error.datetime"})
+    if data_file is not None:
+        try:
+            update, update_errors = parse_data_update(data_file.file.read())
+            errors += update_errors
+        except Exception as e:
+            errors.append({"loc": ["data_file"], "msg": f"can't be parsed: {e}", "type": "value_error.csv"})
+    if errors:
+        return JSONResponse({"detail": errors}, status_code=400)
+
+    task_dir = store.fetch(base_id, ['input', 'meta', 'rostering.json'])
+    df = pd.read_csv(task_dir / 'input', parse_dates=[0], index_col=0)
+    if data_file is not None:
+        df.update(update)
+    with open(task_dir / 'meta', 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    with open(task_dir / 'rostering.json', 'r', encoding='utf-8') as f:
+        rostering = json.load(f)
 
-    with open("./tmp/solver-profile", "wb") as f:
-        f.write(solver_profile_file.file.read())
+    options = {'max_iteration_search_time': time_limit}
+    rostering, report = replan_day(rostering, meta, required_positions(df)['positions'], interval_seconds(df) // 60, cutoff, options)
 
-    task = create_task.delay()
-    return JSONResponse({"id": task.id}, status_code=201)
+    date = cutoff.strftime('%d.%m.%y')
+    return JSONResponse({
+        "date": date,
+        "cutoff": cutoff.strftime('%Y-%m-%d %H:%M:%S'),
+        "report": report,
+        "campainSchedule": [a for a in rostering['campainSchedule'] if a['shiftDate'] == date]
+    })
+
+@app.get("/tasks", responses={
+    200: {
+        "content": {
+            "application/json": {
+                "example": {
+                    "total": 1,
+                    "tasks": [{
+                        "id": "08234f72-29c9-4527-861c-b3d29aabf0e4", "kind": "create", "base_id": None, "client_id": "172.18.0.1",
+                        "submitted_at": "2023-03-01T10:00:00+00:00", "finished_at": "2023-03-01T10:02:10+00:00", "status": "SUCCESS",
+                        "employees": 250, "intervals": 2976,
+                        "inputs": {"input": {"sha256": "5e1f...", "size": 120431}, "meta": {"sha256": "a03c...", "size": 98211},
+                                   "profile": {"sha256": "77b2...", "size": 310}},
+                        "profile": {"scheduling": {"max_iteration_search_time": 60}},
+                        "duration": 128.4, "timings": {"planner": 121.0, "solve": 121.0, "outputs": 5.9, "publish": 0.4},
+                        "artifacts": ["coverage_output.csv", "input", "meta", "profile", "rostering.json", "statistics_output.json"]
+                        }]
+                    }
+            }},
+        "description": "Return registered tasks, newest first, with input hashes and sizes, profile, status, timings and artifacts"
+    },
+    400: {
+        "description": "since or until isn't an iso timestamp"
+    }
+})
+def get_tasks(
+    status: Optional[str] = Query(None, description="PENDING, STARTED, SUCCESS, FAILURE, REVOKED or LOST"),
+    client_id: Optional[str] = Query(None),
+    kind: Optional[str] = Query(None, regex="^(create|reroster)$"),
+    since: Optional[str] = Query(None, description="Submitted at or after, iso timestamp in utc"),
+    until: Optional[str] = Query(None, description="Submitted before, iso timestamp in utc"),
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0)
+):
+    sync(queued=admitted())
+    try:
+        return JSONResponse(list_tasks(status, client_id, kind, since, until, limit, offset))
+    except ValueError as e:
+        return JSONResponse({"detail": [{"loc": ["query"], "msg": str(e), "type": "value_error.datetime"}]}, status_code=400)
 
 @app.get("/task/{id}/status", responses={
     200: {
@@ -125,7 +540,8 @@ def submit_task(
 @remove_422
 def get_task_status(id):
     try:
-        task_result = AsyncResult(id)
+        task_result = AsyncResult(resolve(id))
+        sync([task_result.id], admitted())
 
         if(task_result.status == 'PENDING'):
             return JSONResponse(status_code=404)
@@ -141,20 +557,30 @@ def get_task_status(id):
 
 @app.get("/task/{id}/result", responses={
     200: {
-        "description": "Return json file with results"
+        "description": "Return rostering result: json file, ndjson with an assignment per line (campainUtc in X-Campain-Utc header) "
+                       "or parquet with an assignment per row (campainUtc in file metadata)"
     },
     404: {
         "description": "Task with provided id not found"
     }
 })
-@remove_422
-def get_schedule_result(id):
-    fpath = f'./tmp/{id}/rostering.json'
-    if Path(fpath).exists():
-        return StreamingResponse(iterfile(fpath), media_type = "application/octet-stream")
-    else:
+def get_schedule_result(
+    id,
+    format: str = Query("json", regex="^(json|ndjson|parquet)$", description="Result file format")
+):
+    task_id = resolve(id)
+    stream = store.stream(task_id, RESULT_FILES[format])
+    if stream is None and format != 'json':
+        fpath = result_file(local_artifact(task_id, RESULT_FILES[format]), format)
+        stream = iterfile(fpath) if fpath is not None else None
+    if stream is None:
         return JSONResponse(status_code=404)
 
+    headers = {}
+    if format == 'ndjson':
+        headers['X-Campain-Utc'] = json.dumps(result_campain_utc(task_id))
+    return StreamingResponse(stream, media_type=RESULT_MEDIA_TYPES[format], headers=headers)
+
 @app.get("/task/{id}/statistics-results", responses={
     200: {
         "description": "Return json file with statistics"
@@ -165,11 +591,171 @@ def get_schedule_result(id):
 })
 @remove_422
 def get_stats_result(id):
-    fpath = f'./tmp/{id}/statistics_output.json'
-    if Path(fpath).exists():
-        return StreamingResponse(iterfile(fpath), media_type="application/octet-stream")
-    else:
+    return stream_artifact(resolve(id), 'statistics_output.json')
+
+@app.get("/task/{id}/coverage-results", responses={
+    200: {
+        "description": "Return csv file with employees on shift and productive (net of activities) per interval, shift and utc zone"
+    },
+    404: {
+        "description": "Task with provided id not found"
+    }
+})
+@remove_422
+def get_coverage_result(id):
+    return stream_artifact(resolve(id), 'coverage_output.csv')
+
+@app.get("/task/{id}/shift-quantiles-results", responses={
+    200: {
+        "description": "Return parquet file with capacity and positions quantile per interval (utc) and shift"
+    },
+    404: {
+        "description": "Task with provided id not found"
+    }
+})
+@remove_422
+def get_shift_quantiles_result(id):
+    return stream_artifact(resolve(id), SHIFT_QUANTILES_FILE)
+
+@app.get("/task/{id}/employees/{employee_id}", responses={
+    200: {
+        "content": {
+            "application/json": {
+                "example": {
+                    "campainUtc": 3,
+                    "campainSchedule": [{"employeeId": "1", "shiftId": "Day", "shiftDate": "01.03.23", "shiftTimeStart": "09:00",
+                                         "activities": [{"activityId": "lunch", "activityTimeStart": "13:00", "activityTimeEnd": "13:30"}]}]
+                    }
+            }},
+        "description": "Return assignments of an employee, shaped as the task result"
+    },
+    400: {
+        "description": "Dates aren't dd.mm.yy"
+    },
+    404: {
+        "description": "Task with provided id not found"
+    }
+})
+def get_employee_result(
+    id,
+    employee_id: str,
+    date_from: Optional[str] = Query(None, description="First shift date, dd.mm.yy"),
+    date_to: Optional[str] = Query(None, description="Last shift date, dd.mm.yy")
+):
+    path = result_index(local_artifact(resolve(id), RESULT_INDEX_FILE))
+    if path is None:
         return JSONResponse(status_code=404)
+    try:
+        return JSONResponse(employee_assignments(path, employee_id, date_from, date_to))
+    except ValueError as e:
+        return JSONResponse({"detail": [{"loc": ["query"], "msg": str(e), "type": "value_error.date"}]}, status_code=400)
+
+@app.get("/task/{id}/days/{date}", responses={
+    200: {
+        "description": "Return assignments of all employees on a shift date, shaped as the task result"
+    },
+    400: {
+        "description": "Date isn't dd.mm.yy"
+    },
+    404: {
+        "description": "Task with provided id not found"
+    }
+})
+@remove_422
+def get_day_result(id, date):
+    path = result_index(local_artifact(resolve(id), RESULT_INDEX_FILE))
+    if path is None:
+        return JSONResponse(status_code=404)
+    try:
+        return JSONResponse(day_assignments(path, date))
+    except ValueError as e:
+        return JSONResponse({"detail": [{"loc": ["path", "date"], "msg": str(e), "type": "value_error.date"}]}, status_code=400)
+
+@app.get("/task/{id}/diff/{other_id}", responses={
+    200: {
+        "content": {
+            "application/json": {
+                "example": {
+                    "summary": {"added": 0, "removed": 0, "moved": 1, "activities": 1},
+                    "added": [],
+                    "removed": [],
+                    "moved": [{"before": {"employeeId": "1", "shiftId": "Day", "shiftDate": "01.03.23", "shiftTimeStart": "09:00", "activities": []},
+                               "after": {"employeeId": "1", "shiftId": "Day", "shiftDate": "01.03.23", "shiftTimeStart": "10:00", "activities": []}}],
+                    "activities": [{"employeeId": "2", "shiftDate": "01.03.23", "activityId": "lunch", "before": ["13:00", "13:30"], "after": ["13:30", "14:00"]}]
+                    }
+            }},
+        "description": "Return changes from the result of task id to the result of task other_id"
+    },
+    404: {
+        "description": "Task with provided id not found or has no result"
+    }
+})
+@remove_422
+def get_results_diff(id, other_id):
+    task_ids = [resolve(i) for i in [id, other_id]]
+    if not all(store.exists(i, 'rostering.json') for i in task_ids):
+        return JSONResponse(status_code=404)
+
+    results = []
+    for i in task_ids:
+        with open(store.fetch(i, ['rostering.json']) / 'rostering.json', 'r', encoding='utf-8') as f:
+            results.append(json.load(f))
+
+    return JSONResponse(roster_diff(*results))
+
+@app.get("/task/{id}/reroster-diff", responses={
+    200: {
+        "description": "Return json file with assignments added, removed and moved and activities moved by a re-roster"
+    },
+    404: {
+        "description": "Task with provided id not found"
+    }
+})
+@remove_422
+def get_reroster_diff(id):
+    return stream_artifact(resolve(id), 'diff.json')
+
+@app.put("/task/{id}/pin", responses={
+    200: {
+        "content": {
+            "application/json": {
+                "example": {"id": "cc6b3345-4207-4ebc-94a2-0c8f03d08bb3", "pinned": True}
+            }},
+        "description": "Keep artifacts of the task regardless of retention quotas"
+    },
+    404: {
+        "description": "Task with provided id not found"
+    }
+})
+@remove_422
+def pin_task(id):
+    task_id = resolve(id)
+    if not store.exists(task_id, 'input'):
+        return JSONResponse(status_code=404)
+
+    store.put(task_id, PIN, BytesIO(b''))
+    return JSONResponse({"id": id, "pinned": True})
+
+@app.delete("/task/{id}/pin", responses={
+    200: {
+        "content": {
+            "application/json": {
+                "example": {"id": "cc6b3345-4207-4ebc-94a2-0c8f03d08bb3", "pinned": False}
+            }},
+        "description": "Let retention remove artifacts of the task again"
+    },
+    404: {
+        "description": "Task with provided id not found"
+    }
+})
+@remove_422
+def unpin_task(id):
+    task_id = resolve(id)
+    if not store.exists(task_id, 'input'):
+        return JSONResponse(status_code=404)
+
+    store.remove(task_id, PIN)
+    return JSONResponse({"id": id, "pinned": False})
 
 @app.get("/task/{id}/cancel", responses={
     200: {
@@ -179,7 +765,7 @@ def get_stats_result(id):
                     "id": "cc6b3345-4207-4ebc-94a2-0c8f03d08bb3"
                     }
             }},
-        "description": "Cancel task submited"
+        "description": "Cancel task submited. The solve is stopped only when no other coalesced submission waits for it"
     },
     404: {
         "description": "Task with provided id not found"
@@ -188,11 +774,15 @@ def get_stats_result(id):
 @remove_422
 def cancel_task(id):
     try:
-        task_result = AsyncResult(id)
+        task_result = AsyncResult(resolve(id))
         if(task_result.status == 'PENDING'):
             return JSONResponse(status_code=404)
 
-        res = terminate_task.delay(id)
+        task_id, waiting = release(id)
+        if waiting > 0:
+            return JSONResponse({"id": id})
+
+        res = terminate_task.delay(task_id)
         return JSONResponse({"id": res.id})
     except:
         return JSONResponse(status_code=404)
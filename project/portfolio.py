@@ -0,0 +1,133 @@
+import os
+import json
+import time
+import shutil
+import signal
+from pathlib import Path
+
+import numpy as np
+from billiard import Process
+
+
+def variant_profiles(profile, options):
+    # one profile per variant: the base profile with variant sections merged over its sections
+    base = {k: v for k, v in profile.items() if k != 'portfolio'}
+
+    return [
+        {k: {**base.get(k, {}), **v} if isinstance(v, dict) else v for k, v in {**base, **variant}.items()}
+        for variant in options.get('variants', [{}])
+    ]
+
+
+def score(positions, scheduled):
+    # (understaffed positions, overstaffed positions) over all intervals, lower is better
+    positions = np.asarray(positions, dtype=float)
+    scheduled = np.asarray(scheduled, dtype=float)
+
+    return (float(np.clip(positions - scheduled, 0, None).sum()), float(np.clip(scheduled - positions, 0, None).sum()))
+
+
+def statistics_score(output_dir):
+    # score of the statistics a variant left, None when it left none
+    path = Path(output_dir) / 'statistics_output.json'
+    if not path.exists():
+        return None
+
+    with open(path, 'r', encoding='utf-8') as f:
+        stats = json.load(f)
+
+    return score([r.get('positions', 0) for r in stats], [r.get('scheduled_positions', 0) for r in stats])
+
+
+def run_variant(run, profile, variant_dir):
+    # own process group: the variant and the processes it starts (breaks pools) are stopped together
+    os.setpgid(0, 0)
+    run(profile, variant_dir)
+
+
+def stop(variant):
+    # a variant still running is killed with its whole process group
+    process = variant['process']
+    if process.is_alive():
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            process.kill()
+    process.join()
+
+
+def race(run, profiles, output_dir, deadline=None, variant_score=statistics_score):
+    # runs run(profile, output_dir) for every profile in its own process. at the deadline the best
+    # finished variant wins by variant_score(variant_dir) and the rest are terminated; when none has finished yet,
+    # the first one to finish wins.
+    # outputs of the winner are copied to output_dir. variants are stopped with the task when it's revoked (SIGTERM)
+    variants = []
+
+    def revoked(signum, frame):
+        for v in variants:
+            stop(v)
+        signal.signal(signum, previous_handler)
+        os.kill(os.getpid(), signum)
+
+    try:
+        previous_handler = signal.signal(signal.SIGTERM, revoked)
+    except ValueError:
+        # not the main thread of the worker process, e.g. a threads pool: nothing to hook into
+        previous_handler = None
+
+    try:
+        return race_variants(run, profiles, output_dir, deadline, variants, variant_score)
+    finally:
+        for v in variants:
+            stop(v)
+        if previous_handler is not None:
+            signal.signal(signal.SIGTERM, previous_handler)
+
+
+def race_variants(run, profiles, output_dir, deadline, variants, variant_score):
+    started = time.monotonic()
+    for i, profile in enumerate(profiles):
+        variant_dir = f'{output_dir}/variant_{i}'
+        Path(variant_dir).mkdir(parents=True, exist_ok=True)
+        process = Process(target=run_variant, args=(run, profile, variant_dir))
+        process.start()
+        try:
+            os.setpgid(process.pid, process.pid)
+        except (ProcessLookupError, PermissionError):
+            pass
+        variants.append({'process': process, 'dir': variant_dir, 'seconds': None})
+
+    def finished():
+        for v in variants:
+            if v['seconds'] is None and not v['process'].is_alive():
+                v['seconds'] = time.monotonic() - started
+        return [v for v in variants if v['process'].exitcode == 0]
+
+    while any(v['process'].is_alive() for v in variants):
+        past_deadline = deadline is not None and time.monotonic() - started >= deadline
+        if past_deadline and finished():
+            break
+        time.sleep(0.5)
+
+    finished()
+    for v in variants:
+        stop(v)
+
+    report = []
+    for i, v in enumerate(variants):
+        report.append({
+            'variant': i,
+            'profile': profiles[i],
+            'status': 'terminated' if v['seconds'] is None else 'finished' if v['process'].exitcode == 0 else 'failed',
+            'seconds': v['seconds'],
+            'score': variant_score(v['dir']) if v['process'].exitcode == 0 and v['seconds'] is not None else None
+        })
+
+    scored = [r for r in report if r['status'] == 'finished']
+    if not scored:
+        raise RuntimeError('no portfolio variant finished')
+
+    best = min(scored, key=lambda r: (r['score'] is None, r['score'] or (0, 0), r['seconds']))
+    shutil.copytree(variants[best['variant']]['dir'], output_dir, dirs_exist_ok=True)
+
+    return {'winner': best['variant'], 'variants': report}
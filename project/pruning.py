@@ -0,0 +1,94 @@
+import numpy as np
+
+from validation import minutes
+
+
+def hh_mm(value):
+    value = value % (24 * 60)
+    return f'{value // 60:02d}:{value % 60:02d}'
+
+
+def demand_profile(positions, interval_minutes):
+    # average required positions per interval of a day
+    slots = 24 * 60 // interval_minutes
+    slot = (positions.index.hour * 60 + positions.index.minute) // interval_minutes
+
+    return positions.groupby(slot).mean().reindex(range(slots), fill_value=0).to_numpy(dtype=float)
+
+
+def coverage_scores(profile, starts, duration, interval_minutes):
+    # required positions covered by a shift for every start (minutes of a day in campaign time),
+    # the profile is repeated once to score shifts that end after midnight
+    slots = len(profile)
+    cumulative = np.concatenate([[0.0], np.cumsum(np.tile(profile, 2))])
+
+    first = (np.asarray(starts) // interval_minutes) % slots
+    length = max(duration // interval_minutes, 1)
+
+    return cumulative[first + length] - cumulative[first]
+
+
+def shift_utcs(meta):
+    # shift id -> utc offsets and number of employees who may work it
+    schema_shifts = {s['id']: [ss['shiftId'] for ss in s['shifts']] for s in meta['schemas']}
+
+    usage = {}
+    for e in meta['employees']:
+        for s in e['schemas']:
+            for shift_id in schema_shifts.get(s, []):
+                usage.setdefault(shift_id, {}).setdefault(e['utc'], 0)
+                usage[shift_id][e['utc']] += 1
+
+    return usage
+
+
+def prune_shift_starts(meta, positions, interval_minutes, aggressiveness):
+    # narrow shift start windows to the starts that cover at least `aggressiveness` share
+    # of what the best start covers, for employees of any utc working the shift.
+    # meta can only describe a start window as a range, so starts are dropped from its edges only
+    aggressiveness = min(max(aggressiveness, 0), 1)
+    usage = shift_utcs(meta)
+    days = len(set(positions.index.date))
+    profile = demand_profile(positions, interval_minutes)
+
+    shifts = []
+    report = {'aggressiveness': aggressiveness, 'shifts': {}, 'variables_removed': 0}
+
+    for s in meta['shifts']:
+        if s['id'] not in usage or aggressiveness <= 0:
+            shifts.append(s)
+            continue
+
+        start = minutes(s['scheduleTimeStart'])
+        step = minutes(s['stepTime'])
+        window = (minutes(s['scheduleTimeEndStart']) - start) % (24 * 60)
+        local_starts = start + np.arange(window // step + 1) * step
+
+        keep = np.zeros(len(local_starts), dtype=bool)
+        for utc in usage[s['id']]:
+            scores = coverage_scores(profile, local_starts + (meta['campainUtc'] - utc) * 60, minutes(s['duration']), interval_minutes)
+            if scores.max() > 0:
+                keep |= scores >= aggressiveness * scores.max()
+            else:
+                # no demand at all for this shift, leave it to the solver
+                keep[:] = True
+
+        first, last = np.flatnonzero(keep)[[0, -1]]
+        removed = len(local_starts) - (last - first + 1)
+        employees = sum(usage[s['id']].values())
+
+        report['shifts'][s['id']] = {
+            'candidates': len(local_starts),
+            'removed': int(removed),
+            'scheduleTimeStart': hh_mm(local_starts[first]),
+            'scheduleTimeEndStart': hh_mm(local_starts[last])
+        }
+        report['variables_removed'] += int(removed) * employees * days
+
+        shifts.append({
+            **s,
+            'scheduleTimeStart': hh_mm(local_starts[first]),
+            'scheduleTimeEndStart': hh_mm(local_starts[last])
+        })
+
+    return ({**meta, 'shifts': shifts}, report)
@@ -0,0 +1,30 @@
+from pathlib import Path
+
+import pandas as pd
+
+SHIFT_QUANTILES_FILE = 'shift_quantiles.parquet'
+QUANTILE_COLUMNS = ['capacity', 'positions_quantile']
+
+
+def quantile_files(output_dir):
+    # shift name -> required_positions_<shift>.csv written by the planner
+    return {p.stem[len('required_positions_'):]: p for p in sorted(Path(output_dir).glob('required_positions_*.csv'))}
+
+
+def shift_quantiles_cube(files):
+    # capacity & positions quantile of all shifts in one frame indexed by (tc in utc, shift),
+    # sorted so a day or a shift is a slice of the index
+    frames = []
+    for shift, path in files.items():
+        df = pd.read_csv(path, encoding='utf-8', usecols=['tc'] + QUANTILE_COLUMNS)
+        df['tc'] = pd.to_datetime(df['tc'], utc=True)
+        df['shift'] = shift
+        frames.append(df)
+
+    return pd.concat(frames).groupby(['tc', 'shift']).sum().sort_index()
+
+
+def save_shift_quantiles(output_dir):
+    files = quantile_files(output_dir)
+    if files:
+        shift_quantiles_cube(files).to_parquet(Path(output_dir) / SHIFT_QUANTILES_FILE)
@@ -0,0 +1,194 @@
+import os
+import json
+import sqlite3
+import hashlib
+import datetime as dt
+
+from celery.result import AsyncResult
+
+# every submitted task with its inputs, outcome and timings, kept after celery results expire
+REGISTRY_PATH = os.environ.get("REGISTRY_PATH", "./tmp/registry.sqlite")
+# tasks not seen by celery for this long are lost, e.g. their results expired before they were synced
+REGISTRY_STALE = int(os.environ.get("REGISTRY_STALE", 24 * 60 * 60))
+DURATION_HISTORY = int(os.environ.get("DURATION_HISTORY", 50))
+
+FINAL_STATES = ['SUCCESS', 'FAILURE', 'REVOKED', 'LOST']
+TASK_COLUMNS = [
+    'id', 'kind', 'base_id', 'client_id', 'submitted_at', 'finished_at', 'status',
+    'employees', 'intervals', 'inputs', 'profile', 'duration', 'timings', 'artifacts'
+]
+JSON_COLUMNS = ['inputs', 'profile', 'timings', 'artifacts']
+
+SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS tasks (
+        id TEXT PRIMARY KEY, kind TEXT, base_id TEXT, client_id TEXT,
+        submitted_at TEXT, finished_at TEXT, status TEXT,
+        employees INTEGER, intervals INTEGER, inputs TEXT, profile TEXT,
+        duration REAL, timings TEXT, artifacts TEXT
+    )''',
+    'CREATE INDEX IF NOT EXISTS tasks_submitted ON tasks (submitted_at)',
+    'CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, submitted_at)',
+    'CREATE INDEX IF NOT EXISTS tasks_client ON tasks (client_id, submitted_at)',
+    'CREATE INDEX IF NOT EXISTS tasks_finished ON tasks (kind, status, finished_at)'
+]
+
+
+def now():
+    return dt.datetime.now(dt.timezone.utc).isoformat(timespec='seconds')
+
+
+def utc_timestamp(value):
+    # iso timestamp as stored: in utc, seconds precision; naive ones are taken as utc
+    t = dt.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if t.tzinfo is None:
+        t = t.replace(tzinfo=dt.timezone.utc)
+    return t.astimezone(dt.timezone.utc).isoformat(timespec='seconds')
+
+
+def connect():
+    os.makedirs(os.path.dirname(REGISTRY_PATH) or '.', exist_ok=True)
+    connection = sqlite3.connect(REGISTRY_PATH, timeout=10)
+    connection.row_factory = sqlite3.Row
+    connection.execute('PRAGMA journal_mode=WAL')
+    for statement in SCHEMA:
+        connection.execute(statement)
+    return connection
+
+
+def task_size(data, meta):
+    # employees and intervals of a task, the size its duration depends on
+    try:
+        return (len(json.loads(meta)['employees']), max(data.count(b'\n') - 1, 0))
+    except Exception:
+        return (None, None)
+
+
+def record_submit(task_id, kind, client_id, inputs, profile, size=(None, None), base_id=None):
+    # inputs: name -> content of every input file, only sha256 & size of them are kept
+    employees, intervals = size
+    connection = connect()
+    try:
+        with connection:
+            connection.execute('INSERT OR REPLACE INTO tasks VALUES (?, ?, ?, ?, ?, NULL, ?, ?, ?, ?, ?, NULL, NULL, NULL)', (
+                task_id, kind, base_id, client_id, now(), 'PENDING', employees, intervals,
+                json.dumps({name: {'sha256': hashlib.sha256(content).hexdigest(), 'size': len(content)} for name, content in inputs.items()}),
+                json.dumps(profile, ensure_ascii=False)
+            ))
+    finally:
+        connection.close()
+
+
+def sync(task_ids=None, queued=()):
+    # takes states of unfinished tasks from celery; a finished task's result holds its timings and artifacts.
+    # queued: ids of tasks still queued, celery reports them as PENDING the same as the ones it lost
+    connection = connect()
+    try:
+        query = f"SELECT id, submitted_at FROM tasks WHERE status NOT IN ({', '.join('?' * len(FINAL_STATES))})"
+        args = list(FINAL_STATES)
+        if task_ids is not None:
+            query += f" AND id IN ({', '.join('?' * len(task_ids))})"
+            args += list(task_ids)
+
+        stale = (dt.datetime.now(dt.timezone.utc) - dt.timedelta(seconds=REGISTRY_STALE)).isoformat(timespec='seconds')
+        with connection:
+            for task_id, submitted_at in connection.execute(query, args).fetchall():
+                task_result = AsyncResult(task_id)
+                status = task_result.status
+                if status == 'PENDING' and submitted_at < stale and task_id not in queued:
+                    status = 'LOST'
+
+                if status not in FINAL_STATES:
+                    connection.execute('UPDATE tasks SET status = ? WHERE id = ?', (status, task_id))
+                    continue
+
+                result = task_result.result if status == 'SUCCESS' and isinstance(task_result.result, dict) else {}
+                connection.execute(
+                    'UPDATE tasks SET status = ?, finished_at = ?, duration = ?, timings = ?, artifacts = ? WHERE id = ?', (
+                        status, now(), result.get('duration'),
+                        json.dumps(result.get('timings')), json.dumps(result.get('artifacts')), task_id
+                    )
+                )
+    finally:
+        connection.close()
+
+
+def submitted_tasks(task_ids):
+    # (id, employees, intervals, profile) of the registered ones of task ids, in order of submission
+    task_ids = list(task_ids)
+    if not task_ids:
+        return []
+
+    connection = connect()
+    try:
+        rows = connection.execute(
+            f"SELECT id, employees, intervals, profile FROM tasks WHERE id IN ({', '.join('?' * len(task_ids))}) "
+            "ORDER BY submitted_at, rowid", task_ids
+        )
+        return [(t, e, i, json.loads(p) if p is not None else None) for t, e, i, p in rows.fetchall()]
+    finally:
+        connection.close()
+
+
+def row_dict(row):
+    task = dict(row)
+    for c in JSON_COLUMNS:
+        task[c] = json.loads(task[c]) if task[c] is not None else None
+    return task
+
+
+def list_tasks(status=None, client_id=None, kind=None, since=None, until=None, limit=50, offset=0):
+    # newest first; since & until are iso timestamps of submission
+    where, args = [], []
+    for column, value in [('status', status), ('client_id', client_id), ('kind', kind)]:
+        if value is not None:
+            where.append(f'{column} = ?')
+            args.append(value)
+    if since is not None:
+        where.append('submitted_at >= ?')
+        args.append(utc_timestamp(since))
+    if until is not None:
+        where.append('submitted_at < ?')
+        args.append(utc_timestamp(until))
+    condition = f"WHERE {' AND '.join(where)}" if where else ''
+
+    connection = connect()
+    try:
+        total, = connection.execute(f'SELECT COUNT(*) FROM tasks {condition}', args).fetchone()
+        rows = connection.execute(
+            f'SELECT {", ".join(TASK_COLUMNS)} FROM tasks {condition} ORDER BY submitted_at DESC LIMIT ? OFFSET ?',
+            args + [limit, offset]
+        ).fetchall()
+        return {'total': total, 'tasks': [row_dict(r) for r in rows]}
+    finally:
+        connection.close()
+
+
+def duration_rate():
+    # seconds per employee-interval of recent successful solves, median of them
+    connection = connect()
+    try:
+        rows = connection.execute(
+            "SELECT duration, employees, intervals FROM tasks WHERE kind = 'create' AND status = 'SUCCESS' "
+            "AND duration IS NOT NULL AND employees > 0 AND intervals > 0 ORDER BY finished_at DESC LIMIT ?",
+            (DURATION_HISTORY,)
+        ).fetchall()
+    finally:
+        connection.close()
+
+    if not rows:
+        return None
+
+    rates = sorted(d / (e * i) for d, e, i in rows)
+    return rates[len(rates) // 2]
+
+
+def predicted_duration(employees, intervals, rate=None):
+    # duration of recent successful solves scaled by the size of the task
+    if not employees or not intervals:
+        return None
+
+    rate = rate if rate is not None else duration_rate()
+    if rate is None:
+        return None
+
+    return rate * employees * intervals
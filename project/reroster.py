@@ -0,0 +1,126 @@
+import datetime as dt
+
+from validation import minutes
+from staffing import required_positions, volume_for_positions, interval_seconds
+from coverage import gross_coverage
+
+DATE_FORMAT = '%d.%m.%y'
+
+
+def parse_date(date_string):
+    return dt.datetime.strptime(date_string, DATE_FORMAT).date()
+
+
+def apply_delta(meta, delta):
+    # meta with employees added, removed & modified; returns it with ids of employees to re-roster.
+    # removal is applied last: an employee both removed and modified or added is removed
+    removed = set(delta.get('removed', []))
+    changed = {e['id']: e for e in delta.get('modified', []) + delta.get('added', [])}
+
+    employees = [changed.pop(e['id'], e) for e in meta['employees']]
+    employees += list(changed.values())
+    employees = [e for e in employees if e['id'] not in removed]
+
+    affected = set(e['id'] for e in delta.get('modified', []) + delta.get('added', [])) - removed
+
+    return ({**meta, 'employees': employees}, affected)
+
+
+def is_frozen(assignment, affected, change_date, frozen_days):
+    # assignment stays as in the base roster
+    date = parse_date(assignment['shiftDate'])
+    return assignment['employeeId'] not in affected or date < change_date or date in frozen_days
+
+
+def paid_hours(meta):
+    # shift id -> working hours: duration without unpaid activities
+    activities = {a['id']: a for a in meta['activities']}
+    return {
+        s['id']: (minutes(s['duration']) - sum(
+            minutes(activities[a]['duration']) for a in s['activities'] if a in activities and not activities[a]['isPaid']
+        )) / 60
+        for s in meta['shifts']
+    }
+
+
+def residual_demand(df, fixed, meta, change_date):
+    # demand from change date on, with call volumes reduced to what the fixed assignments don't serve:
+    # fixed coverage is taken off the required positions, and the volume is the max one
+    # the rest of positions serves at the same service level
+    df = df[df.index.date >= change_date]
+    positions = required_positions(df)['positions']
+    covered = gross_coverage(fixed, meta, df.index)
+    residual = (positions - covered).clip(lower=0)
+
+    volume = volume_for_positions(
+        residual, df['call_volume'], df['aht'], df['service_level'], df['art'], interval_seconds(df)
+    )
+
+    return df.assign(call_volume=volume)
+
+
+def sub_meta(meta, affected, fixed, frozen_days):
+    # meta of the affected employees only, their hours reduced by the fixed assignments
+    # and frozen days removed from their schemas
+    hours = paid_hours(meta)
+    worked = {}
+    for a in fixed:
+        if a['employeeId'] in affected:
+            worked[a['employeeId']] = worked.get(a['employeeId'], 0) + hours[a['shiftId']]
+
+    frozen_day_numbers = set(d.day for d in frozen_days)
+    schemas = meta['schemas']
+    if frozen_day_numbers:
+        schemas = [
+            {
+                **s,
+                'shifts': [{**ss, 'days': [d for d in ss['days'] if d not in frozen_day_numbers]} for ss in s['shifts']]
+            }
+            for s in schemas
+        ]
+
+    employees = [
+        {
+            **e,
+            'minWorkingHours': max(e['minWorkingHours'] - worked.get(e['id'], 0), 0),
+            'maxWorkingHours': max(e['maxWorkingHours'] - worked.get(e['id'], 0), 0)
+        }
+        for e in meta['employees'] if e['id'] in affected
+    ]
+
+    return {**meta, 'schemas': schemas, 'employees': employees}
+
+
+def plan_reroster(df, meta, base_rostering, delta):
+    # splits a re-roster into assignments kept as is and a smaller problem for the affected employees only.
+    # demand & sub_meta are None when no employee needs a new roster (e.g. employees were only removed)
+    meta, affected = apply_delta(meta, delta)
+    employees = set(e['id'] for e in meta['employees'])
+
+    change_date = parse_date(delta['changeDate']) if 'changeDate' in delta else min(df.index.date)
+    frozen_days = set(parse_date(d) for d in delta.get('frozenDays', []))
+
+    fixed = [
+        a for a in base_rostering['campainSchedule']
+        if a['employeeId'] in employees and is_frozen(a, affected, change_date, frozen_days)
+    ]
+
+    return {
+        'meta': meta,
+        'affected': affected,
+        'change_date': change_date,
+        'frozen_days': frozen_days,
+        'fixed': fixed,
+        'sub_meta': sub_meta(meta, affected, fixed, frozen_days) if affected else None,
+        'demand': residual_demand(df, fixed, meta, change_date) if affected else None
+    }
+
+
+def merge_reroster(base_rostering, plan, solved):
+    new = [
+        a for a in solved['campainSchedule']
+        if not is_frozen(a, plan['affected'], plan['change_date'], plan['frozen_days'])
+    ]
+    schedule = sorted(plan['fixed'] + new, key=lambda a: (parse_date(a['shiftDate']), str(a['employeeId'])))
+
+    return {**base_rostering, 'campainSchedule': schedule}
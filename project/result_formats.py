@@ -0,0 +1,88 @@
+import json
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from artifacts import replace_with
+
+RESULT_FILES = {
+    'json': 'rostering.json',
+    'ndjson': 'rostering.ndjson',
+    'parquet': 'rostering.parquet'
+}
+RESULT_MEDIA_TYPES = {
+    'json': 'application/octet-stream',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/octet-stream'
+}
+# campainUtc of the result, for headers of responses streaming the roster in other formats
+RESULT_HEADER_FILE = 'rostering_header.json'
+ROW_GROUP_ASSIGNMENTS = 10000
+
+ASSIGNMENT_SCHEMA = pa.schema([
+    ('employeeId', pa.string()),
+    ('shiftId', pa.string()),
+    ('shiftDate', pa.string()),
+    ('shiftTimeStart', pa.string()),
+    ('activities', pa.list_(pa.struct([
+        ('activityId', pa.string()),
+        ('activityTimeStart', pa.string()),
+        ('activityTimeEnd', pa.string())
+    ])))
+])
+
+
+def write_ndjson(file, schedule):
+    # an assignment per line, so clients parse a roster of any size one line at a time
+    for a in schedule:
+        file.write(json.dumps(a, ensure_ascii=False).encode('utf-8'))
+        file.write(b'\n')
+
+
+def write_parquet(file, rostering):
+    # assignments as rows with activities as a list column, written in row groups
+    # so neither writing nor reading a group at a time holds the whole roster in arrow memory.
+    # campainUtc is kept in the file metadata
+    schema = ASSIGNMENT_SCHEMA.with_metadata({'campainUtc': json.dumps(rostering.get('campainUtc'))})
+    schedule = rostering['campainSchedule']
+
+    with pq.ParquetWriter(file, schema) as writer:
+        for i in range(0, max(len(schedule), 1), ROW_GROUP_ASSIGNMENTS):
+            group = schedule[i:i + ROW_GROUP_ASSIGNMENTS]
+            writer.write_table(pa.Table.from_pylist([
+                {
+                    'employeeId': str(a['employeeId']),
+                    'shiftId': str(a['shiftId']),
+                    'shiftDate': a['shiftDate'],
+                    'shiftTimeStart': a['shiftTimeStart'],
+                    'activities': [
+                        {k: x[k] for k in ['activityId', 'activityTimeStart', 'activityTimeEnd']}
+                        for x in a.get('activities', [])
+                    ]
+                }
+                for a in group
+            ], schema=schema))
+
+
+def campain_utc(path):
+    return json.loads(pq.read_schema(path).metadata[b'campainUtc'])
+
+
+def save_result_formats(output_dir, rostering):
+    # line-delimited and columnar copies of rostering.json; every file is written to a temporary file of its own
+    # first, so a reader sees complete files and api requests converting the same result don't write into each other
+    replace_with(Path(output_dir) / RESULT_FILES['ndjson'], lambda f: write_ndjson(f, rostering['campainSchedule']))
+    replace_with(Path(output_dir) / RESULT_FILES['parquet'], lambda f: write_parquet(f, rostering))
+    replace_with(Path(output_dir) / RESULT_HEADER_FILE, lambda f: f.write(json.dumps({'campainUtc': rostering.get('campainUtc')}).encode()))
+
+
+def result_file(output_dir, format):
+    # result of a task in a format, converted on first use for results finished before formats were written
+    path = Path(output_dir) / RESULT_FILES[format]
+    rostering_path = Path(output_dir) / RESULT_FILES['json']
+    if not path.exists() and rostering_path.exists():
+        with open(rostering_path, 'r', encoding='utf-8') as f:
+            save_result_formats(output_dir, json.load(f))
+
+    return path if path.exists() else None
@@ -0,0 +1,78 @@
+import os
+import json
+import sqlite3
+from pathlib import Path
+
+from reroster import parse_date
+from artifacts import temporary_path
+
+RESULT_INDEX_FILE = 'rostering.sqlite'
+
+
+def build_index(output_dir, rostering):
+    # assignments of a roster in sqlite indexed by employee and day, so one employee's month
+    # or one day of all employees is read without parsing rostering.json.
+    # written to a temporary file of its own first, readers see a complete index or none
+    # and api requests indexing the same result don't write into each other
+    path = Path(output_dir) / RESULT_INDEX_FILE
+    tmp_path = temporary_path(path)
+
+    connection = sqlite3.connect(tmp_path)
+    try:
+        connection.execute('CREATE TABLE roster (campainUtc INTEGER)')
+        connection.execute('INSERT INTO roster VALUES (?)', (rostering.get('campainUtc'),))
+        connection.execute('CREATE TABLE assignments (employeeId TEXT, day TEXT, shiftTimeStart TEXT, assignment TEXT)')
+        connection.executemany('INSERT INTO assignments VALUES (?, ?, ?, ?)', (
+            (str(a['employeeId']), parse_date(a['shiftDate']).isoformat(), a['shiftTimeStart'], json.dumps(a, ensure_ascii=False))
+            for a in rostering['campainSchedule']
+        ))
+        connection.execute('CREATE INDEX employee_day ON assignments (employeeId, day, shiftTimeStart)')
+        connection.execute('CREATE INDEX day_employee ON assignments (day, employeeId)')
+        connection.commit()
+    except BaseException:
+        connection.close()
+        os.remove(tmp_path)
+        raise
+    connection.close()
+
+    os.replace(tmp_path, path)
+    return path
+
+
+def result_index(output_dir):
+    # index of a task result, built on first use for results finished before indexes were written
+    path = Path(output_dir) / RESULT_INDEX_FILE
+    if not path.exists():
+        rostering_path = Path(output_dir) / 'rostering.json'
+        if not rostering_path.exists():
+            return None
+        with open(rostering_path, 'r', encoding='utf-8') as f:
+            build_index(output_dir, json.load(f))
+
+    return path
+
+
+def query_index(path, where, args):
+    # rostering.json shaped subset of the result
+    connection = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        campain_utc, = connection.execute('SELECT campainUtc FROM roster').fetchone()
+        rows = connection.execute(f'SELECT assignment FROM assignments WHERE {where} ORDER BY day, shiftTimeStart, employeeId', args)
+        return {'campainUtc': campain_utc, 'campainSchedule': [json.loads(a) for a, in rows]}
+    finally:
+        connection.close()
+
+
+def employee_assignments(path, employee_id, date_from=None, date_to=None):
+    # dates as shiftDate (dd.mm.yy), both included
+    where, args = 'employeeId = ?', [str(employee_id)]
+    if date_from is not None:
+        where, args = where + ' AND day >= ?', args + [parse_date(date_from).isoformat()]
+    if date_to is not None:
+        where, args = where + ' AND day <= ?', args + [parse_date(date_to).isoformat()]
+
+    return query_index(path, where, args)
+
+
+def day_assignments(path, date):
+    return query_index(path, 'day = ?', [parse_date(date).isoformat()])
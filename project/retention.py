@@ -0,0 +1,140 @@
+import os
+import json
+import time
+import uuid
+
+from celery.result import AsyncResult
+
+from broker import redis_client
+from admission import admitted
+
+# quotas on artifacts of finished tasks, 0 turns a quota off; pinned tasks are kept in any case
+RETENTION_MAX_AGE_DAYS = float(os.environ.get("RETENTION_MAX_AGE_DAYS", 30))
+RETENTION_MAX_TASKS = int(os.environ.get("RETENTION_MAX_TASKS", 1000))
+RETENTION_MAX_BYTES = int(os.environ.get("RETENTION_MAX_BYTES", 20 * 1024 ** 3))
+# artifacts of tasks older than this are gzipped, 0 turns compression off
+RETENTION_COMPRESS_AFTER_DAYS = float(os.environ.get("RETENTION_COMPRESS_AFTER_DAYS", 7))
+RETENTION_COMPRESS_MIN_BYTES = int(os.environ.get("RETENTION_COMPRESS_MIN_BYTES", 64 * 1024))
+# tasks scanned & removed, and tasks compressed, in one run; a run never takes long, the next one continues
+RETENTION_BATCH = int(os.environ.get("RETENTION_BATCH", 200))
+RETENTION_COMPRESS_BATCH = int(os.environ.get("RETENTION_COMPRESS_BATCH", 20))
+RETENTION_INTERVAL = float(os.environ.get("RETENTION_INTERVAL", 10 * 60))
+# tasks unknown to celery (results expired) are finished when their artifacts are older than this
+RETENTION_MIN_AGE = float(os.environ.get("RETENTION_MIN_AGE", 24 * 60 * 60))
+
+USAGE_KEY = "retention:usage"
+CURSOR_KEY = "retention:cursor"
+
+DAY = 24 * 60 * 60
+
+
+def is_task_id(name):
+    # the artifact root may hold other things, e.g. caches of the solver
+    try:
+        uuid.UUID(name)
+        return True
+    except ValueError:
+        return False
+
+
+def load_usage():
+    return {k.decode(): json.loads(v) for k, v in redis_client.hgetall(USAGE_KEY).items()}
+
+
+def scan(store, task_ids, usage):
+    # usage of the next batch of tasks after the cursor, wrapping around; usage of tasks gone is dropped
+    gone = [t for t in usage if t not in task_ids]
+    if gone:
+        redis_client.hdel(USAGE_KEY, *gone)
+
+    cursor = (redis_client.get(CURSOR_KEY) or b'').decode()
+    ordered = sorted(task_ids)
+    batch = [t for t in ordered if t > cursor][:RETENTION_BATCH]
+    if len(batch) < RETENTION_BATCH:
+        batch += [t for t in ordered if t <= cursor][:RETENTION_BATCH - len(batch)]
+
+    scanned = {}
+    for task_id in batch:
+        u = store.usage(task_id)
+        if u['created'] is None:
+            continue
+        # compression rewrites artifacts, so a task's age is the oldest time ever seen
+        previous = usage.get(task_id)
+        if previous is not None and previous['created'] is not None:
+            u['created'] = min(u['created'], previous['created'])
+        scanned[task_id] = u
+
+    if scanned:
+        redis_client.hset(USAGE_KEY, mapping={k: json.dumps(v) for k, v in scanned.items()})
+    if batch:
+        redis_client.set(CURSOR_KEY, batch[-1])
+
+    return ({**{t: u for t, u in usage.items() if t in task_ids}, **scanned}, len(batch))
+
+
+def is_finished(task_id, age, queued):
+    # a PENDING task is either unknown to celery or still queued, queued ones are tracked by admission
+    status = AsyncResult(task_id).status
+    return status in ['SUCCESS', 'FAILURE', 'REVOKED'] or (status == 'PENDING' and age >= RETENTION_MIN_AGE and task_id not in queued)
+
+
+def expired(usage, now, queued):
+    # finished unpinned tasks to remove, oldest first, while any quota is exceeded:
+    # age, count or size (pinned tasks count towards the quotas, but are never removed)
+    count = len(usage)
+    total = sum(u['bytes'] for u in usage.values())
+
+    remove = []
+    for created, task_id in sorted((u['created'], t) for t, u in usage.items() if not u['pinned']):
+        too_old = RETENTION_MAX_AGE_DAYS > 0 and now - created > RETENTION_MAX_AGE_DAYS * DAY
+        too_many = RETENTION_MAX_TASKS > 0 and count > RETENTION_MAX_TASKS
+        too_big = RETENTION_MAX_BYTES > 0 and total > RETENTION_MAX_BYTES
+        if not (too_old or too_many or too_big) or len(remove) >= RETENTION_BATCH:
+            break
+        if not is_finished(task_id, now - created, queued):
+            continue
+
+        remove.append(task_id)
+        count -= 1
+        total -= usage[task_id]['bytes']
+
+    return remove
+
+
+def collect(store):
+    # one incremental retention run: scan a batch, remove tasks over quotas, compress old ones
+    started = time.monotonic()
+    now = time.time()
+
+    task_ids = set(t for t in store.task_ids() if is_task_id(t))
+    usage, scanned = scan(store, task_ids, load_usage())
+
+    queued = admitted()
+    removed = expired(usage, now, queued)
+    for task_id in removed:
+        store.delete(task_id)
+    if removed:
+        redis_client.hdel(USAGE_KEY, *removed)
+
+    compressed, saved = [], 0
+    if RETENTION_COMPRESS_AFTER_DAYS > 0:
+        for task_id, u in sorted(usage.items(), key=lambda x: x[1]['created']):
+            if len(compressed) >= RETENTION_COMPRESS_BATCH:
+                break
+            if task_id in removed or u['pinned'] or u['compressed'] or now - u['created'] < RETENTION_COMPRESS_AFTER_DAYS * DAY:
+                continue
+            if not is_finished(task_id, now - u['created'], queued):
+                continue
+
+            saved += store.compress(task_id, RETENTION_COMPRESS_MIN_BYTES)
+            redis_client.hset(USAGE_KEY, task_id, json.dumps({**store.usage(task_id), 'created': u['created'], 'compressed': True}))
+            compressed.append(task_id)
+
+    return {
+        'tasks': len(task_ids),
+        'scanned': scanned,
+        'removed': removed,
+        'compressed': compressed,
+        'bytes_saved': saved,
+        'seconds': round(time.monotonic() - started, 3)
+    }
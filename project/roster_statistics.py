@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+from staffing import interval_seconds, intensity, log_waiting_probability, service_level, required_positions
+from coverage import net_coverage
+
+
+def average_answer_time(positions, volume, aht, interval=15 * 60):
+    # Erlang C mean waiting time of a call in seconds, NaN when the queue isn't stable
+    positions = np.asarray(positions, dtype=int)
+    aht = np.asarray(aht, dtype=float)
+    a = intensity(volume, aht, interval)
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        art = np.exp(log_waiting_probability(positions, a)) * aht / (positions - a)
+
+    return np.where(a <= 0, 0.0, np.where(positions > a, art, np.nan))
+
+
+def roster_statistics(df, rostering, meta):
+    # statistics_output.json columns for any roster: required positions, employees on shift net of activities,
+    # and the service level (%) and answer time (seconds) they reach per interval of the demand csv
+    interval = interval_seconds(df)
+    scheduled = net_coverage(rostering['campainSchedule'], meta, df.index).clip(lower=0)
+
+    return pd.DataFrame({
+        'call_volume': df['call_volume'],
+        'aht': df['aht'],
+        'service_level': df['service_level'],
+        'art': df['art'],
+        'positions': required_positions(df)['positions'],
+        'scheduled_positions': scheduled,
+        'scheduled_service_level': service_level(scheduled, df['call_volume'], df['aht'], df['art'], interval) * 100,
+        'scheduled_art': average_answer_time(scheduled, df['call_volume'], df['aht'], interval)
+    }, index=df.index)
@@ -0,0 +1,174 @@
+import os
+
+import numpy as np
+import pandas as pd
+from redis.exceptions import RedisError
+
+from broker import redis_client
+
+STAFFING_KEY = "staffing:erlang"
+# the shared table expires when not written for a while and is started over above max entries,
+# the table of each process is started over above max entries too
+STAFFING_CACHE_TTL = int(os.environ.get("STAFFING_CACHE_TTL", 7 * 24 * 60 * 60))
+STAFFING_CACHE_MAX = int(os.environ.get("STAFFING_CACHE_MAX", 100000))
+DATA_COLUMNS = ['call_volume', 'aht', 'service_level', 'art']
+
+# rounding of (call_volume, aht, service_level, art) in memoization keys
+KEY_DECIMALS = [2, 1, 2, 1]
+# agents above twice the traffic intensity at which the search for a service level gives up
+MAX_POSITIONS_ABOVE_INTENSITY = 1000
+
+_table = {}
+
+
+def interval_seconds(df):
+    if len(df) < 2:
+        return 15 * 60
+
+    return int(df.index.to_series().diff().median().total_seconds())
+
+
+def intensity(volume, aht, interval):
+    return np.asarray(volume, dtype=float) * np.asarray(aht, dtype=float) / interval
+
+
+def log_waiting_probability(positions, a):
+    # Erlang C probability of waiting in log space, for positions > a.
+    # Erlang B is taken by the recursion B(k) = a*B(k-1) / (k + a*B(k-1)), which stays in [0, 1]
+    # for any number of agents, unlike the factorial form
+    positions = np.asarray(positions, dtype=int)
+    b = np.ones_like(a)
+    for k in range(1, int(positions.max(initial=0)) + 1):
+        b = np.where(k <= positions, a * b / (k + a * b), b)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.log(positions * b) - np.log(positions - a * (1 - b))
+
+
+def service_level(positions, volume, aht, art, interval=15 * 60):
+    # share of calls answered within art, 0..1; vectorized over all arguments
+    positions, volume, aht, art = np.broadcast_arrays(
+        np.asarray(positions, dtype=int), np.asarray(volume, dtype=float),
+        np.asarray(aht, dtype=float), np.asarray(art, dtype=float)
+    )
+    a = intensity(volume, aht, interval)
+    stable = positions > a
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        sl = 1 - np.exp(log_waiting_probability(positions, a) - (positions - a) * art / aht)
+
+    return np.where(a <= 0, 1.0, np.where(stable, sl, 0.0))
+
+
+def erlang_c_positions(volume, aht, sl, art, interval=15 * 60):
+    # minimal positions to reach service level sl (in %) per row, and zero level positions,
+    # i.e. minimal positions to keep a queue stable.
+    # all rows are searched at once: agents are added one by one and a row drops out as soon as its target is met
+    volume, aht, sl, art = [np.asarray(x, dtype=float) for x in (volume, aht, sl, art)]
+    a = intensity(volume, aht, interval)
+    target = np.minimum(sl / 100, 1 - 1e-6)
+
+    # rows with a non-finite input never reach any target, they get no positions
+    finite = np.isfinite(a) & np.isfinite(target) & np.isfinite(art) & np.isfinite(aht)
+    positions = np.zeros(len(a), dtype=int)
+    zero_level = np.where(finite & (a > 0), np.floor(np.where(finite, a, 0)).astype(int) + 1, 0)
+    done = ~finite | (a <= 0)
+
+    # targets are met within a few dozen agents above the intensity, the cap only bounds the search
+    # for extreme inputs, rows still searching at the cap get it
+    max_positions = int(np.max(np.where(done, 0, a), initial=0)) * 2 + MAX_POSITIONS_ABOVE_INTENSITY
+
+    b = np.ones_like(a)
+    n = 0
+    while not done.all() and n < max_positions:
+        n += 1
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            b = a * b / (n + a * b)
+            log_pw = np.log(n * b) - np.log(n - a * (1 - b))
+            reached = (n > a) & (1 - np.exp(log_pw - (n - a) * art / aht) >= target)
+
+        reached &= ~done
+        positions[reached] = n
+        done |= reached
+
+    positions[~done] = n
+    return (positions, zero_level)
+
+
+def volume_for_positions(positions, volume, aht, sl, art, interval=15 * 60, iterations=30):
+    # max call volume (not above the given one) that positions still serve at service level sl (in %),
+    # by bisection over all rows at once
+    positions, volume, aht, sl, art = [np.asarray(x, dtype=float) for x in (positions, volume, aht, sl, art)]
+    target = np.minimum(sl / 100, 1 - 1e-6)
+
+    served = service_level(positions, volume, aht, art, interval) >= target
+    lo = np.where(served, volume, 0.0)
+    hi = volume.copy()
+
+    for _ in range(iterations):
+        mid = (lo + hi) / 2
+        ok = service_level(positions, mid, aht, art, interval) >= target
+        lo = np.where(ok & ~served, mid, lo)
+        hi = np.where(ok | served, hi, mid)
+
+    return np.where(positions > 0, lo, 0.0)
+
+
+def staffing_keys(df, interval):
+    rounded = df[DATA_COLUMNS].astype(float).round(dict(zip(DATA_COLUMNS, KEY_DECIMALS)))
+    return rounded, [f'{v:g}|{aht:g}|{sl:g}|{art:g}|{interval}' for v, aht, sl, art in rounded.itertuples(index=False)]
+
+
+def store_positions(computed):
+    try:
+        if redis_client.hlen(STAFFING_KEY) + len(computed) > STAFFING_CACHE_MAX:
+            redis_client.delete(STAFFING_KEY)
+
+        pipe = redis_client.pipeline()
+        pipe.hset(STAFFING_KEY, mapping={k: f'{p},{z}' for k, (p, z) in computed.items()})
+        pipe.expire(STAFFING_KEY, STAFFING_CACHE_TTL)
+        pipe.execute()
+    except RedisError:
+        pass
+
+
+def required_positions(df):
+    # positions & zero_level_positions per interval of the demand csv.
+    # (volume, aht, sl, art) tuples repeat heavily across days, so each unique tuple is computed once
+    # and kept in a table shared by all api & worker processes
+    interval = interval_seconds(df)
+    rounded, keys = staffing_keys(df, interval)
+
+    unique = rounded.assign(key=keys).drop_duplicates(subset='key')
+    found = {k: _table[k] for k in unique['key'] if k in _table}
+    missing = unique[~unique['key'].isin(found.keys())]
+
+    if len(missing) > 0:
+        try:
+            stored = redis_client.hmget(STAFFING_KEY, list(missing['key']))
+        except RedisError:
+            stored = [None] * len(missing)
+
+        for key, value in zip(missing['key'], stored):
+            if value is not None:
+                found[key] = tuple(int(x) for x in value.decode().split(','))
+
+        missing = missing[~missing['key'].isin(found.keys())]
+
+    if len(missing) > 0:
+        positions, zero_level = erlang_c_positions(
+            missing['call_volume'], missing['aht'], missing['service_level'], missing['art'], interval
+        )
+        computed = {key: (int(p), int(z)) for key, p, z in zip(missing['key'], positions, zero_level)}
+        found.update(computed)
+        store_positions(computed)
+
+    if len(_table) + len(found) > STAFFING_CACHE_MAX:
+        _table.clear()
+    _table.update(found)
+
+    values = np.array([found[k] for k in keys], dtype=int).reshape(-1, 2)
+    return pd.DataFrame({
+        'positions': values[:, 0],
+        'zero_level_positions': values[:, 1]
+    }, index=df.index)
@@ -0,0 +1,71 @@
+import time
+import threading
+
+from ortools.sat.python import cp_model
+
+# stopping criteria of a phase in the solver profile
+STOPPING_KEYS = ['relative_gap_limit', 'no_improvement_time']
+
+
+def stopping_options(options):
+    return {k: options[k] for k in STOPPING_KEYS if options.get(k) is not None}
+
+
+class StopCallback(cp_model.CpSolverSolutionCallback):
+    # stops a minimization when its objective is within relative_gap_limit of the best bound,
+    # or when no better solution was found for no_improvement_time seconds
+    def __init__(self, relative_gap_limit=None, no_improvement_time=None):
+        super().__init__()
+        self.relative_gap_limit = relative_gap_limit
+        self.no_improvement_time = no_improvement_time
+        self.reason = None
+        self.best = None
+        self.improved = time.monotonic()
+        self.done = threading.Event()
+
+    def on_solution_callback(self):
+        objective = self.ObjectiveValue()
+        if self.best is None or objective < self.best:
+            self.best = objective
+            self.improved = time.monotonic()
+
+        gap = abs(objective - self.BestObjectiveBound()) / max(abs(objective), 1)
+        if self.relative_gap_limit is not None and gap <= self.relative_gap_limit:
+            self.stop('gap')
+
+    def watch(self):
+        # solutions callback isn't called while the search stagnates, so the time is checked from a thread
+        while not self.done.wait(0.1):
+            if self.best is not None and time.monotonic() - self.improved >= self.no_improvement_time:
+                self.stop('stagnation')
+                return
+
+    def stop(self, reason):
+        if self.reason is None:
+            self.reason = reason
+            self.StopSearch()
+
+
+def solve(solver, model, options):
+    # solves with the stopping criteria of options; returns status and why the search stopped:
+    # optimal, infeasible, gap, stagnation or time_limit
+    callback = StopCallback(**stopping_options(options))
+
+    watcher = None
+    if callback.no_improvement_time is not None:
+        watcher = threading.Thread(target=callback.watch, daemon=True)
+        watcher.start()
+
+    status = solver.Solve(model, callback)
+    callback.done.set()
+    if watcher is not None:
+        watcher.join()
+
+    if callback.reason is not None:
+        return (status, callback.reason)
+    if status == cp_model.OPTIMAL:
+        return (status, 'optimal')
+    if status in (cp_model.INFEASIBLE, cp_model.MODEL_INVALID):
+        return (status, 'infeasible')
+
+    return (status, 'time_limit')
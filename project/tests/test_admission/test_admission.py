@@ -0,0 +1,120 @@
+import os
+import sys
+import time
+
+import fakeredis
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+import admission
+import registry
+
+
+class Result:
+    # celery result of a task by states kept in the test
+    states = {}
+
+    def __init__(self, task_id):
+        self.status = self.states.get(task_id, 'PENDING')
+        self.result = None
+
+    def ready(self):
+        return self.status in registry.FINAL_STATES
+
+
+@pytest.fixture(autouse=True)
+def isolated(monkeypatch, tmp_path):
+    Result.states = {}
+    monkeypatch.setattr(admission, 'redis_client', fakeredis.FakeRedis())
+    monkeypatch.setattr(admission, 'AsyncResult', Result)
+    monkeypatch.setattr(registry, 'AsyncResult', Result)
+    monkeypatch.setattr(registry, 'REGISTRY_PATH', str(tmp_path / 'registry.sqlite'))
+    monkeypatch.setattr(admission, 'WORKER_CONCURRENCY', 1)
+    monkeypatch.setattr(admission, 'MAX_QUEUED_TASKS', 3)
+    monkeypatch.setattr(admission, 'MAX_CLIENT_TASKS', 2)
+
+
+def submit(task_id, client_id, employees, intervals=100):
+    registry.record_submit(task_id, 'create', client_id, {}, {}, (employees, intervals))
+    admission.register(task_id, client_id)
+
+
+def learn_rate(seconds_per_employee):
+    # a finished task of 10 employees, so predicted durations are seconds_per_employee per employee
+    registry.record_submit('done', 'create', 'c', {}, {}, (10, 100))
+    connection = registry.connect()
+    with connection:
+        connection.execute("UPDATE tasks SET status = 'SUCCESS', finished_at = ?, duration = ? WHERE id = 'done'",
+                           (registry.now(), seconds_per_employee * 10))
+    connection.close()
+
+
+def test_admit_free_worker():
+    position, eta = admission.admit('a')
+    assert position == 0
+    assert abs((eta - admission.dt.datetime.now(admission.dt.timezone.utc)).total_seconds()) < 5
+
+
+def test_eta_sums_tasks_ahead():
+    learn_rate(1)
+    submit('small1', 'a', 10)
+    submit('small2', 'b', 10)
+    admission.record_start('small1')
+
+    # a large task waits for the small ones ahead, not for its own size times their number
+    position, eta = admission.admit('c')
+    wait = (eta - admission.dt.datetime.now(admission.dt.timezone.utc)).total_seconds()
+    assert position == 2
+    assert 15 < wait <= 20
+
+    submit('large', 'c', 1000)
+    position, eta = admission.queue_position('large')
+    wait = (eta - admission.dt.datetime.now(admission.dt.timezone.utc)).total_seconds()
+    assert position == 2
+    assert 15 < wait <= 20
+
+    position, _ = admission.queue_position('small2')
+    assert position == 1
+
+
+def test_reject_full_queue_retry_after_running_task():
+    learn_rate(1)
+    submit('running', 'a', 30)
+    submit('queued1', 'b', 1000)
+    submit('queued2', 'c', 1000)
+    admission.redis_client.hset(admission.STARTED_KEY, 'running', time.time() - 10)
+
+    with pytest.raises(admission.AdmissionRejected) as e:
+        admission.admit('d')
+    assert 'Queue is full' in e.value.reason
+    assert 19 <= e.value.retry_after <= 20
+
+
+def test_reject_client_quota_retry_after_own_task(monkeypatch):
+    monkeypatch.setattr(admission, 'MAX_QUEUED_TASKS', 20)
+    learn_rate(1)
+    submit('other', 'b', 10)
+    submit('own1', 'a', 50)
+    submit('own2', 'a', 50)
+    admission.record_start('other')
+
+    with pytest.raises(admission.AdmissionRejected) as e:
+        admission.admit('a')
+    assert 'Client quota exceeded' in e.value.reason
+    # the first own task starts after the other one and runs 50s
+    assert 59 <= e.value.retry_after <= 60
+
+
+def test_finished_tasks_free_places():
+    submit('t1', 'a', 10)
+    submit('t2', 'b', 10)
+    submit('t3', 'c', 10)
+    with pytest.raises(admission.AdmissionRejected):
+        admission.admit('d')
+
+    Result.states['t1'] = 'SUCCESS'
+    position, _ = admission.admit('d')
+    assert position == 2
+    assert admission.admitted() == {'t2', 't3'}
+    assert registry.list_tasks(status='SUCCESS')['total'] == 1
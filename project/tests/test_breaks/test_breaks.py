@@ -0,0 +1,101 @@
+import os
+import sys
+import json
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+from breaks import place_breaks, replan_day
+from staffing import required_positions, interval_seconds
+from validation import minutes
+
+
+def rostering_without_breaks(meta, employees=6):
+    return {
+        'campainUtc': meta['campainUtc'],
+        'campainSchedule': [
+            {
+                'employeeId': f'employee-{i}',
+                'shiftId': meta['shifts'][0]['id'],
+                'shiftDate': '01.03.23',
+                'shiftTimeStart': f'{9 + i % 3:02d}:00',
+                'activities': []
+            }
+            for i in range(employees)
+        ]
+    }
+
+
+def test_breaks_placed_into_roster_without_breaks():
+    #Arrange
+    df = pd.read_csv('test_breaks/_data_file_improvisation.csv', parse_dates=[0], index_col=0)
+    with open('test_breaks/_meta_file_breaks.json', 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    activities = [a['id'] for a in meta['activities']]
+
+    for engine in ['cp-sat', 'greedy']:
+        rostering = rostering_without_breaks(meta)
+
+        #Act
+        rostering, report = place_breaks(
+            rostering, meta, required_positions(df)['positions'], interval_seconds(df) // 60,
+            {'engine': engine, 'num_workers': 1, 'max_iteration_search_time': 5}
+        )
+
+        #Assert
+        assert len(report) == 1
+        for a in rostering['campainSchedule']:
+            assert [x['activityId'] for x in a['activities']] == activities
+
+
+def test_unplaceable_shifts_keep_their_activities():
+    #Arrange
+    df = pd.read_csv('test_breaks/_data_file_improvisation.csv', parse_dates=[0], index_col=0)
+    with open('test_breaks/_meta_file_breaks.json', 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    # the last activity can't start within its window 4h after the ones before
+    meta['shifts'][0]['minIntervalBetweenActivities'] = '04:00'
+
+    for engine in ['cp-sat', 'greedy']:
+        rostering = rostering_without_breaks(meta)
+        rostering['campainSchedule'][0]['activities'] = [
+            {'activityId': a['id'], 'activityTimeStart': start, 'activityTimeEnd': end}
+            for a, (start, end) in zip(meta['activities'], [('10:00', '10:15'), ('12:00', '12:30'), ('14:30', '14:45')])
+        ]
+        before = json.loads(json.dumps(rostering))
+
+        #Act
+        rostering, report = place_breaks(
+            rostering, meta, required_positions(df)['positions'], interval_seconds(df) // 60,
+            {'engine': engine, 'num_workers': 1, 'max_iteration_search_time': 5}
+        )
+
+        #Assert
+        assert report[0]['unplaceable'] == len(rostering['campainSchedule'])
+        assert rostering == before
+
+
+def test_replan_keeps_closed_windows():
+    #Arrange
+    df = pd.read_csv('test_breaks/_data_file_improvisation.csv', parse_dates=[0], index_col=0)
+    with open('test_breaks/_meta_file_breaks.json', 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    meta['shifts'][0]['minIntervalBetweenActivities'] = '00:30'
+    windows = {a['id']: (minutes(a['timeStart']), minutes(a['timeEndStart'])) for a in meta['activities']}
+    rostering = rostering_without_breaks(meta)
+    cutoff = pd.Timestamp('2023-03-01 13:15')
+
+    #Act
+    rostering, report = replan_day(
+        rostering, meta, required_positions(df)['positions'], interval_seconds(df) // 60, cutoff, {'max_iteration_search_time': 1}
+    )
+
+    #Assert
+    # shifts starting at 09:00 can't start their first activity after the cutoff within its window
+    assert report[0]['unplaceable'] == sum(a['shiftTimeStart'] == '09:00' for a in rostering['campainSchedule'])
+    for a in rostering['campainSchedule']:
+        start = minutes(a['shiftTimeStart'])
+        for x in a['activities']:
+            offset = minutes(x['activityTimeStart']) - start
+            assert windows[x['activityId']][0] <= offset <= windows[x['activityId']][1]
+            assert minutes(x['activityTimeStart']) >= 13 * 60 + 15
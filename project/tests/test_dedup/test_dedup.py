@@ -0,0 +1,85 @@
+import os
+import sys
+import threading
+
+import fakeredis
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+import dedup
+
+FINAL_STATES = {'SUCCESS', 'FAILURE', 'REVOKED'}
+
+
+class Result:
+    # celery result of a task by states kept in the test
+    states = {}
+
+    def __init__(self, task_id):
+        self.status = self.states.get(task_id, 'PENDING')
+
+    def ready(self):
+        return self.status in FINAL_STATES
+
+
+@pytest.fixture(autouse=True)
+def isolated(monkeypatch):
+    Result.states = {}
+    monkeypatch.setattr(dedup, 'redis_client', fakeredis.FakeRedis())
+    monkeypatch.setattr(dedup, 'AsyncResult', Result)
+
+
+def test_concurrent_claims_start_one_task():
+    claimed = {}
+    barrier = threading.Barrier(8)
+
+    def submit(i):
+        barrier.wait()
+        claimed[i] = dedup.claim('key', f'task-{i}')
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # every submit ends up with the one task that claimed the key
+    winner, = set(claimed.values())
+    assert winner in {f'task-{i}' for i in range(8)}
+    assert dedup.find_inflight('key') == winner
+
+
+def test_claim_takes_over_finished_task():
+    assert dedup.claim('key', 'first') == 'first'
+    assert dedup.claim('key', 'second') == 'first'
+
+    Result.states['first'] = 'SUCCESS'
+
+    assert dedup.claim('key', 'second') == 'second'
+    assert dedup.find_inflight('key') == 'second'
+
+
+def test_cancel_revokes_only_when_last_reference_is_released():
+    dedup.claim('key', 'task')
+    dedup.track('task')
+    first = dedup.attach('task')
+    second = dedup.attach('task')
+
+    assert dedup.resolve(first) == 'task'
+    assert dedup.release(first) == ('task', 2)
+    assert dedup.release('task') == ('task', 1)
+    # a handle released twice doesn't release another one
+    assert dedup.release(first) == ('task', 1)
+    assert dedup.release(second) == ('task', 0)
+
+
+def test_attach_refreshes_references():
+    dedup.track('task')
+    refs = dedup.REFS_KEY.format('task')
+    dedup.redis_client.expire(refs, 10)
+
+    dedup.attach('task')
+
+    # references outlive a long solve as long as it gets new submissions
+    assert dedup.redis_client.ttl(refs) > dedup.DEDUP_TTL - 10
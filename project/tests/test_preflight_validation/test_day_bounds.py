@@ -0,0 +1,45 @@
+import os
+import sys
+from itertools import groupby, product
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+from validation import day_bounds
+
+
+def feasible(rules, days, pattern):
+    # runs of work (1) and rest (0) within their min..max days in a row, on days allowed for them;
+    # the first and the last run may continue from and into neighbouring periods, so their min is not checked
+    work_days, work_min, work_max, rest_days, rest_min, rest_max = rules
+    if any(day not in (work_days if p else rest_days) for day, p in zip(days, pattern)):
+        return False
+
+    runs = [(p, len(list(g))) for p, g in groupby(pattern)]
+    for i, (p, length) in enumerate(runs):
+        run_min, run_max = (work_min, work_max) if p else (rest_min, rest_max)
+        if length > run_max or (0 < i < len(runs) - 1 and length < run_min):
+            return False
+
+    return True
+
+
+def brute_force_bounds(rules, days):
+    work = [sum(p) for p in product([0, 1], repeat=len(days)) if feasible(rules, days, p)]
+    return (min(work), max(work)) if work else None
+
+
+def test_day_bounds_brute_force():
+    days = list(range(1, 13))
+    all_days = frozenset(days)
+    cases = [
+        (all_days, 1, 5, all_days, 1, 3),
+        (all_days, 2, 2, all_days, 2, 2),
+        (all_days, 3, 4, all_days, 1, 1),
+        (all_days, 5, 5, all_days, 2, 2),
+        (frozenset(d for d in days if d % 7 not in (6, 0)), 1, 5, all_days, 2, 3),
+        (frozenset([1, 2, 3]), 1, 3, frozenset(days[3:]), 1, 2),
+        (frozenset([1, 2, 3]), 1, 3, frozenset(days[4:]), 1, 9)
+    ]
+
+    for rules in cases:
+        assert day_bounds(rules, days) == brute_force_bounds(rules, days), rules
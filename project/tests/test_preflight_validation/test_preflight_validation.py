@@ -0,0 +1,35 @@
+import requests
+import os
+from dotenv import load_dotenv, find_dotenv
+
+
+def test_preflight_validation():
+    load_dotenv(find_dotenv())
+
+    files = {
+        "data_file": open('test_preflight_validation/_data_file_improvisation.csv', 'rb'),
+        "meta_file": open('test_preflight_validation/_meta_file_preflight_validation.json', 'rb')
+    }
+    response = requests.post(os.getenv('urlget') + 'validate', files=files)
+    assert response.status_code == 200
+    assert response.json()['valid']
+    assert response.json()['errors'] == []
+
+    files = {
+        "data_file": open('test_preflight_validation/_data_file_improvisation.csv', 'rb'),
+        "meta_file": open('test_preflight_validation/_meta_file_preflight_validation_infeasible.json', 'rb')
+    }
+    response = requests.post(os.getenv('urlget') + 'validate', files=files)
+    assert response.status_code == 200
+    assert not response.json()['valid']
+
+    error_types = [e['type'] for e in response.json()['errors']]
+    assert 'value_error.reference' in error_types
+
+    files = {
+        "data_file": open('test_preflight_validation/_data_file_improvisation.csv', 'rb'),
+        "meta_file": open('test_preflight_validation/_meta_file_preflight_validation_infeasible.json', 'rb'),
+        "solver_profile_file": open('test_preflight_validation/_solver_profile_file.json', 'rb')
+    }
+    response = requests.post(os.getenv('urlpost') + '?preflight=true', files=files)
+    assert response.status_code == 400
@@ -0,0 +1,79 @@
+import os
+import sys
+import datetime as dt
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+from reroster import apply_delta, merge_reroster
+
+
+def employee(id, max_hours=176):
+    return {'id': id, 'utc': 3, 'minWorkingHours': 0, 'maxWorkingHours': max_hours, 'schemas': ['schema']}
+
+
+def assignment(employee_id, date, start='09:00'):
+    return {'employeeId': employee_id, 'shiftId': 'shift', 'shiftDate': date, 'shiftTimeStart': start, 'activities': []}
+
+
+def test_apply_delta():
+    meta = {'campainUtc': 3, 'employees': [employee(1), employee(2), employee(3)]}
+    delta = {
+        'removed': [2],
+        'modified': [employee(3, 100)],
+        'added': [employee(4)]
+    }
+
+    new_meta, affected = apply_delta(meta, delta)
+
+    assert [e['id'] for e in new_meta['employees']] == [1, 3, 4]
+    assert new_meta['employees'][1]['maxWorkingHours'] == 100
+    assert affected == {3, 4}
+    assert [e['id'] for e in meta['employees']] == [1, 2, 3]
+
+
+def test_apply_delta_removal_wins():
+    # an employee removed and modified or added in the same delta is removed, not re-added with a stale roster
+    meta = {'campainUtc': 3, 'employees': [employee(1), employee(2)]}
+    delta = {
+        'removed': [2, 5],
+        'modified': [employee(2, 100)],
+        'added': [employee(5)]
+    }
+
+    new_meta, affected = apply_delta(meta, delta)
+
+    assert [e['id'] for e in new_meta['employees']] == [1]
+    assert affected == set()
+
+
+def test_merge_reroster():
+    base = {
+        'campainUtc': 3,
+        'campainSchedule': [assignment(1, '01.03.23'), assignment(2, '01.03.23'), assignment(2, '03.03.23')]
+    }
+    plan = {
+        'affected': {2},
+        'change_date': dt.date(2023, 3, 2),
+        'frozen_days': {dt.date(2023, 3, 4)},
+        # assignments kept: of employees not affected, before the change date or on frozen days
+        'fixed': [assignment(1, '01.03.23'), assignment(2, '01.03.23')]
+    }
+    solved = {
+        'campainUtc': 3,
+        'campainSchedule': [
+            assignment(2, '01.03.23', '12:00'),
+            assignment(2, '02.03.23', '10:00'),
+            assignment(2, '04.03.23', '10:00'),
+            assignment(2, '05.03.23', '10:00')
+        ]
+    }
+
+    merged = merge_reroster(base, plan, solved)
+
+    assert merged['campainUtc'] == 3
+    assert [(a['employeeId'], a['shiftDate'], a['shiftTimeStart']) for a in merged['campainSchedule']] == [
+        (1, '01.03.23', '09:00'),
+        (2, '01.03.23', '09:00'),
+        (2, '02.03.23', '10:00'),
+        (2, '05.03.23', '10:00')
+    ]
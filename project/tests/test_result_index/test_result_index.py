@@ -0,0 +1,72 @@
+import requests
+import pandas as pd
+from io import BytesIO
+import json
+import time
+import os
+from dotenv import load_dotenv, find_dotenv
+
+
+def test_result_index():
+    load_dotenv(find_dotenv())
+
+    #Arrange
+    files = {
+        'data_file': open('test_result_index/_data_file_improvisation.csv', 'rb'),
+        'meta_file': open('test_result_index/_meta_file_result_index.json', 'rb'),
+        'solver_profile_file': open('test_result_index/_solver_profile_file.json', 'rb')
+    }
+
+    #Act
+    res = requests.post(os.getenv('urlpost'), files=files)
+    time.sleep(20)
+
+    #Assert
+    id = (res.json()['id'])
+    schedule = requests.get(os.getenv('urlget') + f'task/{id}/result').json()['campainSchedule']
+
+    employee_id = schedule[0]['employeeId']
+    response = requests.get(os.getenv('urlget') + f'task/{id}/employees/{employee_id}')
+    assert response.status_code == 200
+    expected = sorted(json.dumps(a, sort_keys=True) for a in schedule if a['employeeId'] == employee_id)
+    assert sorted(json.dumps(a, sort_keys=True) for a in response.json()['campainSchedule']) == expected
+
+    date = schedule[0]['shiftDate']
+    response = requests.get(os.getenv('urlget') + f'task/{id}/days/{date}')
+    assert response.status_code == 200
+    assert len(response.json()['campainSchedule']) == len([a for a in schedule if a['shiftDate'] == date])
+
+    response = requests.get(os.getenv('urlget') + f'task/{id}/days/2023-03-01')
+    assert response.status_code == 400
+
+    response = requests.get(os.getenv('urlget') + f'task/{id}/diff/{id}')
+    assert response.status_code == 200
+    assert response.json()['summary'] == {'added': 0, 'removed': 0, 'moved': 0, 'activities': 0}
+
+
+def test_result_formats():
+    load_dotenv(find_dotenv())
+
+    #Arrange
+    files = {
+        'data_file': open('test_result_index/_data_file_improvisation.csv', 'rb'),
+        'meta_file': open('test_result_index/_meta_file_result_index.json', 'rb'),
+        'solver_profile_file': open('test_result_index/_solver_profile_file.json', 'rb')
+    }
+
+    #Act
+    res = requests.post(os.getenv('urlpost'), files=files)
+    time.sleep(20)
+
+    #Assert
+    id = (res.json()['id'])
+    rostering = requests.get(os.getenv('urlget') + f'task/{id}/result').json()
+
+    response = requests.get(os.getenv('urlget') + f'task/{id}/result?format=ndjson')
+    assert response.status_code == 200
+    assert [json.loads(line) for line in response.text.splitlines()] == rostering['campainSchedule']
+    assert json.loads(response.headers['X-Campain-Utc']) == rostering['campainUtc']
+
+    response = requests.get(os.getenv('urlget') + f'task/{id}/result?format=parquet')
+    assert response.status_code == 200
+    assert len(pd.read_parquet(BytesIO(response.content))) == len(rostering['campainSchedule'])
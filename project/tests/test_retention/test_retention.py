@@ -0,0 +1,137 @@
+import io
+import os
+import sys
+import time
+import uuid
+
+import fakeredis
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+import admission
+import retention
+from artifacts import LocalStore, PIN
+
+DAY = 24 * 60 * 60
+
+
+class Result:
+    # celery result of a task by states kept in the test
+    states = {}
+
+    def __init__(self, task_id):
+        self.status = self.states.get(task_id, 'SUCCESS')
+
+
+@pytest.fixture(autouse=True)
+def isolated(monkeypatch):
+    Result.states = {}
+    redis_client = fakeredis.FakeRedis()
+    monkeypatch.setattr(retention, 'redis_client', redis_client)
+    monkeypatch.setattr(admission, 'redis_client', redis_client)
+    monkeypatch.setattr(retention, 'AsyncResult', Result)
+    monkeypatch.setattr(retention, 'RETENTION_MAX_AGE_DAYS', 30)
+    monkeypatch.setattr(retention, 'RETENTION_MAX_TASKS', 0)
+    monkeypatch.setattr(retention, 'RETENTION_MAX_BYTES', 0)
+    monkeypatch.setattr(retention, 'RETENTION_COMPRESS_AFTER_DAYS', 7)
+    monkeypatch.setattr(retention, 'RETENTION_COMPRESS_MIN_BYTES', 1024)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return LocalStore(tmp_path)
+
+
+def stored_task(store, age_days, size=4096, pinned=False):
+    # a task with artifacts stored age_days ago
+    task_id = str(uuid.uuid4())
+    content = b'{"campainSchedule": []}'.ljust(size)
+    store.put(task_id, 'rostering.json', io.BytesIO(content))
+    if pinned:
+        store.put(task_id, PIN, io.BytesIO(b''))
+
+    created = time.time() - age_days * DAY
+    for path in store.task_dir(task_id).rglob('*'):
+        os.utime(path, (created, created))
+
+    return task_id
+
+
+def usage_of(store, task_ids):
+    return {t: store.usage(t) for t in task_ids}
+
+
+def test_expired_by_age_keeps_pinned_and_unfinished(store):
+    old = stored_task(store, 40)
+    pinned = stored_task(store, 40, pinned=True)
+    running = stored_task(store, 40)
+    lost = stored_task(store, 40)
+    queued = stored_task(store, 40)
+    recent = stored_task(store, 1)
+    Result.states.update({running: 'STARTED', lost: 'PENDING', queued: 'PENDING'})
+
+    removed = retention.expired(usage_of(store, [old, pinned, running, lost, queued, recent]), time.time(), {queued})
+
+    # a PENDING task unknown to celery is finished, a queued one is not
+    assert sorted(removed) == sorted([old, lost])
+
+
+def test_expired_by_count_oldest_first(store, monkeypatch):
+    monkeypatch.setattr(retention, 'RETENTION_MAX_AGE_DAYS', 0)
+    monkeypatch.setattr(retention, 'RETENTION_MAX_TASKS', 2)
+    tasks = [stored_task(store, age) for age in [5, 4, 3, 2]]
+
+    assert retention.expired(usage_of(store, tasks), time.time(), set()) == tasks[:2]
+
+
+def test_expired_by_size(store, monkeypatch):
+    monkeypatch.setattr(retention, 'RETENTION_MAX_AGE_DAYS', 0)
+    monkeypatch.setattr(retention, 'RETENTION_MAX_BYTES', 10000)
+    tasks = [stored_task(store, age, size=4096) for age in [3, 2, 1]]
+
+    assert retention.expired(usage_of(store, tasks), time.time(), set()) == tasks[:1]
+
+
+def test_collect_removes_and_compresses(store):
+    old = stored_task(store, 40)
+    aged = stored_task(store, 10)
+    small = stored_task(store, 10, size=100)
+    recent = stored_task(store, 1)
+
+    report = retention.collect(store)
+
+    assert report['removed'] == [old]
+    assert not store.task_dir(old).exists()
+    assert sorted(report['compressed']) == sorted([aged, small])
+    assert report['bytes_saved'] > 0
+
+    # compressed artifacts are gzipped in place, small ones are left as they are
+    assert (store.task_dir(aged) / 'rostering.json.gz').exists()
+    assert not (store.task_dir(aged) / 'rostering.json').exists()
+    assert (store.task_dir(small) / 'rostering.json').exists()
+    assert (store.task_dir(recent) / 'rostering.json').exists()
+
+    # compression keeps a task's age, fetch restores the artifact
+    assert retention.load_usage()[aged]['created'] < time.time() - 9 * DAY
+    store.fetch(aged, ['rostering.json'])
+    assert (store.task_dir(aged) / 'rostering.json').read_bytes().startswith(b'{"campainSchedule": []}')
+
+
+def test_scan_cursor_wraps_around(store, monkeypatch):
+    monkeypatch.setattr(retention, 'RETENTION_BATCH', 2)
+    tasks = sorted(stored_task(store, 1) for _ in range(3))
+
+    scanned = []
+    for _ in range(3):
+        usage, count = retention.scan(store, set(tasks), retention.load_usage())
+        assert count == 2
+        scanned.append(retention.redis_client.get(retention.CURSOR_KEY).decode())
+
+    # batches: [0, 1], [2, 0], [1, 2]
+    assert scanned == [tasks[1], tasks[0], tasks[2]]
+    assert sorted(usage) == tasks
+
+    # usage of tasks gone is dropped
+    usage, _ = retention.scan(store, set(tasks[1:]), retention.load_usage())
+    assert sorted(retention.load_usage()) == tasks[1:]
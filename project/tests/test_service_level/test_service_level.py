@@ -0,0 +1,66 @@
+import requests
+import json
+import os
+import pandas as pd
+from io import StringIO
+from dotenv import load_dotenv, find_dotenv
+
+
+def service_level_files():
+    return {
+        "data_file": open('test_service_level/_data_file_improvisation.csv', 'rb'),
+        "meta_file": open('test_service_level/_meta_file_service_level.json', 'rb'),
+        "rostering_file": open('test_service_level/_rostering_file_service_level.json', 'rb')
+    }
+
+
+def test_service_level():
+    load_dotenv(find_dotenv())
+
+    response = requests.post(os.getenv('urlget') + 'service-level', files=service_level_files())
+    assert response.status_code == 200
+
+    stats = response.json()
+    scheduled = dict(zip(stats['tc'], stats['scheduled_positions']))
+
+    # on shift 09:00 - 18:00, activities at 11:00, 13:00 - 13:30 and 16:00 are not counted
+    assert scheduled['2023-03-01 08:45:00'] == 0
+    assert scheduled['2023-03-01 09:00:00'] == 1
+    assert scheduled['2023-03-01 11:00:00'] == 0
+    assert scheduled['2023-03-01 11:15:00'] == 1
+    assert scheduled['2023-03-01 13:00:00'] == 0
+    assert scheduled['2023-03-01 13:15:00'] == 0
+    assert scheduled['2023-03-01 16:00:00'] == 0
+    assert scheduled['2023-03-01 17:45:00'] == 1
+    assert scheduled['2023-03-01 18:00:00'] == 0
+    assert sum(stats['scheduled_positions']) == 36 - 1 - 2 - 1
+
+    assert all(0 <= sl <= 100 for sl in stats['scheduled_service_level'])
+
+    response = requests.post(os.getenv('urlget') + 'service-level?format=csv', files=service_level_files())
+    assert response.status_code == 200
+
+    df_stats = pd.read_csv(StringIO(response.text))
+    assert list(df_stats['scheduled_positions']) == stats['scheduled_positions']
+
+
+def test_service_level_bad_rostering():
+    load_dotenv(find_dotenv())
+
+    files = service_level_files()
+    files["rostering_file"] = ('rostering.json', b'{}')
+    response = requests.post(os.getenv('urlget') + 'service-level', files=files)
+    assert response.status_code == 400
+    assert response.json()['detail'][0]['loc'] == ['rostering_file']
+
+
+def test_service_level_unknown_shift():
+    load_dotenv(find_dotenv())
+
+    files = service_level_files()
+    rostering = json.load(files["rostering_file"])
+    rostering['campainSchedule'][0]['shiftId'] = 'unknown'
+    files["rostering_file"] = ('rostering.json', json.dumps(rostering).encode())
+    response = requests.post(os.getenv('urlget') + 'service-level', files=files)
+    assert response.status_code == 400
+    assert response.json()['detail'][0]['loc'] == ['rostering_file', 'campainSchedule', 0, 'shiftId']
@@ -0,0 +1,48 @@
+import requests
+import os
+import pandas as pd
+from io import StringIO
+from dotenv import load_dotenv, find_dotenv
+
+
+def test_staffing():
+    load_dotenv(find_dotenv())
+
+    df = pd.read_csv('test_staffing/_data_file_improvisation.csv', index_col=0)
+
+    files = {
+        "data_file": open('test_staffing/_data_file_improvisation.csv', 'rb')
+    }
+    response = requests.post(os.getenv('urlget') + 'staffing', files=files)
+    assert response.status_code == 200
+
+    staffing = response.json()
+    assert len(staffing['tc']) == len(df)
+    assert all(p >= z for p, z in zip(staffing['positions'], staffing['zero_level_positions']))
+    assert all(p > 0 for p, v in zip(staffing['positions'], df['call_volume']) if v > 0)
+
+    files = {
+        "data_file": open('test_staffing/_data_file_improvisation.csv', 'rb')
+    }
+    response = requests.post(os.getenv('urlget') + 'staffing?format=csv', files=files)
+    assert response.status_code == 200
+
+    df_staffing = pd.read_csv(StringIO(response.text))
+    assert list(df_staffing['positions']) == staffing['positions']
+
+
+def test_staffing_blank_value():
+    load_dotenv(find_dotenv())
+
+    data = open('test_staffing/_data_file_improvisation.csv', 'rb').read().splitlines()
+    header, first = data[0].decode().split(','), data[1].decode().split(',')
+    first[header.index('aht')] = ''
+    data[1] = ','.join(first).encode()
+
+    files = {
+        "data_file": ('_data_file_improvisation.csv', b'\n'.join(data))
+    }
+    response = requests.post(os.getenv('urlget') + 'staffing', files=files)
+    assert response.status_code == 400
+    assert response.json()['detail'][0]['loc'] == ['data_file', 0, 'aht']
+    assert response.json()['detail'][0]['type'] == 'value_error.missing'
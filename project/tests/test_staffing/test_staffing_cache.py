@@ -0,0 +1,44 @@
+import os
+import sys
+
+import fakeredis
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+import staffing
+
+
+@pytest.fixture(autouse=True)
+def isolated(monkeypatch):
+    monkeypatch.setattr(staffing, 'redis_client', fakeredis.FakeRedis())
+    monkeypatch.setattr(staffing, '_table', {})
+
+
+def demand(volumes):
+    index = pd.date_range('2023-03-01', periods=len(volumes), freq='15min')
+    return pd.DataFrame({'call_volume': volumes, 'aht': 300, 'service_level': 80, 'art': 20}, index=index)
+
+
+def test_shared_table_expires():
+    positions = staffing.required_positions(demand([10, 20, 10]))
+
+    assert staffing.redis_client.hlen(staffing.STAFFING_KEY) == 2
+    assert 0 < staffing.redis_client.ttl(staffing.STAFFING_KEY) <= staffing.STAFFING_CACHE_TTL
+
+    # served from the shared table by another process
+    staffing._table.clear()
+    assert staffing.required_positions(demand([10, 20, 10])).equals(positions)
+
+
+def test_tables_are_capped(monkeypatch):
+    monkeypatch.setattr(staffing, 'STAFFING_CACHE_MAX', 3)
+    staffing.required_positions(demand([10, 20]))
+
+    positions = staffing.required_positions(demand([30, 40]))
+
+    # both tables start over instead of growing past the cap
+    assert staffing.redis_client.hlen(staffing.STAFFING_KEY) == 2
+    assert len(staffing._table) == 2
+    assert list(positions['positions']) == list(staffing.required_positions(demand([30, 40]))['positions'])
@@ -0,0 +1,459 @@
+import io
+import json
+
+import numpy as np
+import pandas as pd
+
+from staffing import DATA_COLUMNS, interval_seconds, required_positions
+from stopping import STOPPING_KEYS
+
+META_SECTIONS = ['campainUtc', 'activities', 'shifts', 'schemas', 'employees']
+BREAKS_ENGINES = ['pyworkforce', 'cp-sat', 'greedy']
+
+
+def error(loc, msg, type):
+    # same shape as fastapi validation errors
+    return {"loc": loc, "msg": msg, "type": type}
+
+
+def minutes(time_string):
+    hh, mm = time_string.split(":")
+    return int(hh) * 60 + int(mm)
+
+
+def parse_data(data):
+    df = pd.read_csv(io.BytesIO(data), parse_dates=[0], index_col=0)
+
+    errors = []
+    missing = [c for c in DATA_COLUMNS if c not in df.columns]
+    if missing:
+        errors.append(error(["data_file"], f"missing columns: {', '.join(missing)}", "value_error.missing"))
+        return df, errors
+
+    if len(df) == 0:
+        errors.append(error(["data_file"], "no intervals", "value_error.empty"))
+    if not pd.api.types.is_datetime64_any_dtype(df.index):
+        errors.append(error(["data_file", "tc"], "interval timestamps can't be parsed", "type_error.datetime"))
+    elif df.index.has_duplicates:
+        errors.append(error(["data_file", "tc"], "duplicated intervals", "value_error.duplicate"))
+
+    for c in DATA_COLUMNS:
+        if not pd.api.types.is_numeric_dtype(df[c]):
+            errors.append(error(["data_file", c], "not a number", "type_error.number"))
+            continue
+        # blank cells are read as nan, the staffing model needs a value in every interval
+        for row in np.flatnonzero(~np.isfinite(df[c].to_numpy(dtype=float))):
+            errors.append(error(["data_file", int(row), c], f"no value at {df.index[row]}", "value_error.missing"))
+        if (df[c] < 0).any():
+            errors.append(error(["data_file", c], "negative values", "value_error.number.not_ge"))
+
+    return df, errors
+
+
+def parse_data_update(data):
+    # re-forecast of some intervals: tc and any of the data columns
+    df = pd.read_csv(io.BytesIO(data), parse_dates=[0], index_col=0)
+
+    errors = []
+    columns = [c for c in df.columns if c in DATA_COLUMNS]
+    if not columns:
+        errors.append(error(["data_file"], f"none of columns: {', '.join(DATA_COLUMNS)}", "value_error.missing"))
+        return df, errors
+
+    if not pd.api.types.is_datetime64_any_dtype(df.index):
+        errors.append(error(["data_file", "tc"], "interval timestamps can't be parsed", "type_error.datetime"))
+    elif df.index.has_duplicates:
+        errors.append(error(["data_file", "tc"], "duplicated intervals", "value_error.duplicate"))
+
+    for c in columns:
+        if not pd.api.types.is_numeric_dtype(df[c]):
+            errors.append(error(["data_file", c], "not a number", "type_error.number"))
+            continue
+        # blank cells keep the current value, infinite ones are errors
+        for row in np.flatnonzero(np.isinf(df[c].to_numpy(dtype=float))):
+            errors.append(error(["data_file", int(row), c], f"no finite value at {df.index[row]}", "value_error.missing"))
+        if (df[c] < 0).any():
+            errors.append(error(["data_file", c], "negative values", "value_error.number.not_ge"))
+
+    return df[columns], errors
+
+
+def profile_sections(profile, name):
+    # (loc, section) of a profile section and of its overrides in portfolio variants
+    sections = [(["solver_profile_file", name], profile.get(name))]
+
+    portfolio = profile.get('portfolio')
+    if isinstance(portfolio, dict):
+        for i, variant in enumerate(portfolio.get('variants') or []):
+            if isinstance(variant, dict):
+                sections.append((["solver_profile_file", "portfolio", "variants", i, name], variant.get(name)))
+
+    return [(loc, section) for loc, section in sections if section is not None]
+
+
+def check_number(section, loc, key, low, high=None, types=(int, float)):
+    value = section.get(key)
+    if value is None:
+        return []
+    if isinstance(value, bool) or not isinstance(value, types):
+        return [error(loc + [key], "not an integer" if types == (int,) else "not a number", "type_error.number")]
+    if value < low or (high is not None and value > high):
+        bounds = f"between {low} and {high}" if high is not None else f"at least {low}"
+        return [error(loc + [key], f"must be {bounds}", "value_error.number.not_in_range")]
+    return []
+
+
+def check_pruning(profile):
+    errors = []
+    for loc, section in profile_sections(profile, 'pruning'):
+        if not isinstance(section, dict):
+            errors.append(error(loc, "not an object", "type_error.dict"))
+            continue
+        errors += check_number(section, loc, 'aggressiveness', 0, 1)
+
+    return errors
+
+
+def check_rolling_horizon(profile):
+    # a window of up to 28 days always fits into a month of the planner
+    errors = []
+    for loc, section in profile_sections(profile, 'rolling_horizon'):
+        if not isinstance(section, dict):
+            errors.append(error(loc, "not an object", "type_error.dict"))
+            continue
+        errors += check_number(section, loc, 'window_days', 1, 28, (int,))
+        errors += check_number(section, loc, 'overlap_days', 0, None, (int,))
+
+    return errors
+
+
+def check_breaks(profile):
+    # options of our breaks engines, checked before the planner runs for all of its time limit
+    errors = []
+    for loc, section in profile_sections(profile, 'breaks'):
+        if not isinstance(section, dict):
+            errors.append(error(loc, "not an object", "type_error.dict"))
+            continue
+        if 'engine' in section and section['engine'] not in BREAKS_ENGINES:
+            errors.append(error(loc + ['engine'], f"must be one of: {', '.join(BREAKS_ENGINES)}", "value_error.const"))
+        if 'polish' in section and not isinstance(section['polish'], bool):
+            errors.append(error(loc + ['polish'], "not a boolean", "type_error.bool"))
+        errors += check_number(section, loc, 'num_workers', 1, None, (int,))
+
+    return errors
+
+
+def check_stopping(profile):
+    # stopping criteria apply to our breaks searches only, the planner's scheduling & rostering searches
+    # run without callbacks and would silently ignore them
+    errors = []
+    for phase in ['scheduling', 'rostering']:
+        for loc, section in profile_sections(profile, phase):
+            if not isinstance(section, dict):
+                continue
+            errors += [
+                error(loc + [k], f"stopping criteria aren't supported in the {phase} phase, only in breaks", "value_error.unsupported")
+                for k in STOPPING_KEYS if k in section
+            ]
+
+    return errors
+
+
+def parse_profile(profile):
+    # solver phases and worker options
+    profile = json.loads(profile)
+
+    if not isinstance(profile, dict):
+        return profile, [error(["solver_profile_file"], "not an object", "type_error.dict")]
+
+    errors = check_pruning(profile) + check_rolling_horizon(profile) + check_breaks(profile) + check_stopping(profile)
+    return profile, errors
+
+
+def parse_meta(meta):
+    meta = json.loads(meta)
+
+    errors = [
+        error(["meta_file", s], "field required", "value_error.missing")
+        for s in META_SECTIONS if s not in meta
+    ]
+    return meta, errors
+
+
+def unique_ids(meta, section):
+    errors = []
+    seen = set()
+    for i, item in enumerate(meta[section]):
+        if item['id'] in seen:
+            errors.append(error(["meta_file", section, i, "id"], f"duplicated id '{item['id']}'", "value_error.duplicate"))
+        seen.add(item['id'])
+
+    return errors
+
+
+def schema_rules(schema, shift_ids=None):
+    # (work days, work min/max in row, rest days, rest min/max in row) of a schema,
+    # shifts of a schema are merged: a day is a working day if any of its shifts may be assigned on it
+    schema_shifts = [s for s in schema['shifts'] if shift_ids is None or s['shiftId'] in shift_ids]
+    if not schema_shifts:
+        return None
+
+    holidays = schema['holidays']
+    return (
+        frozenset(d for s in schema_shifts for d in s['days']),
+        min(s['minDaysInRow'] for s in schema_shifts),
+        max(s['maxDaysInRow'] for s in schema_shifts),
+        frozenset(holidays['days']),
+        holidays['minDaysInRow'],
+        holidays['maxDaysInRow']
+    )
+
+
+def transitions(rules, state, day):
+    # work and rest alternate in runs of min..max days in a row;
+    # a run started at the horizon start may continue from previous period, so its min length is not checked
+    work_days, work_min, work_max, rest_days, rest_min, rest_max = rules
+    is_work, run, free = state
+    run_min, run_max = (work_min, work_max) if is_work else (rest_min, rest_max)
+
+    next_states = []
+    if run < run_max and day in (work_days if is_work else rest_days):
+        next_states.append((is_work, run + 1, free))
+    if (run >= run_min or free) and day in (rest_days if is_work else work_days):
+        next_states.append((not is_work, 1, False))
+
+    return next_states
+
+
+def start_states(rules, day):
+    work_days, _, _, rest_days, _, _ = rules
+    return [(is_work, 1, True) for is_work, allowed in ((True, work_days), (False, rest_days)) if day in allowed]
+
+
+def day_bounds(rules, days):
+    # min/max number of working days over the horizon
+    # states: (is_work, run length, started at horizon start) -> (min work days, max work days)
+    states = {s: (int(s[0]), int(s[0])) for s in start_states(rules, days[0])}
+
+    for day in days[1:]:
+        next_states = {}
+        for state, (lo, hi) in states.items():
+            for s in transitions(rules, state, day):
+                add = int(s[0])
+                if s in next_states:
+                    p_lo, p_hi = next_states[s]
+                    next_states[s] = (min(p_lo, lo + add), max(p_hi, hi + add))
+                else:
+                    next_states[s] = (lo + add, hi + add)
+
+        states = next_states
+
+    if not states:
+        return None
+
+    return (min(lo for lo, _ in states.values()), max(hi for _, hi in states.values()))
+
+
+def schema_bounds(schema, shifts, activities, days):
+    # (min days, max days, min shift hours, max shift hours) for a schema
+    rules = schema_rules(schema, shifts)
+    if rules is None:
+        return None
+
+    bounds = day_bounds(rules, days)
+    if bounds is None:
+        return None
+
+    schema_shifts = [s for s in schema['shifts'] if s['shiftId'] in shifts]
+
+    # working time of a shift is counted by the solver somewhere between
+    # its duration without all activities and its full duration
+    durations = [minutes(shifts[s['shiftId']]['duration']) / 60 for s in schema_shifts]
+    net_durations = [
+        (minutes(shifts[s['shiftId']]['duration']) - sum(activities[a] for a in shifts[s['shiftId']]['activities'])) / 60
+        for s in schema_shifts
+    ]
+    return (bounds[0], bounds[1], min(net_durations), max(durations))
+
+
+def check_references(meta):
+    errors = []
+    for section in ['activities', 'shifts', 'schemas', 'employees']:
+        errors += unique_ids(meta, section)
+
+    activities = {a['id']: a for a in meta['activities']}
+    shifts = {s['id']: s for s in meta['shifts']}
+    schemas = {s['id']: s for s in meta['schemas']}
+
+    for i, s in enumerate(meta['shifts']):
+        for a in s['activities']:
+            if a not in activities:
+                errors.append(error(["meta_file", "shifts", i, "activities"], f"unknown activity '{a}'", "value_error.reference"))
+
+    for i, s in enumerate(meta['schemas']):
+        for j, ss in enumerate(s['shifts']):
+            if ss['shiftId'] not in shifts:
+                errors.append(error(["meta_file", "schemas", i, "shifts", j, "shiftId"], f"unknown shift '{ss['shiftId']}'", "value_error.reference"))
+
+    for i, e in enumerate(meta['employees']):
+        if not e['schemas']:
+            errors.append(error(["meta_file", "employees", i, "schemas"], f"employee {e['id']} has no schemas", "value_error.missing"))
+        for s in e['schemas']:
+            if s not in schemas:
+                errors.append(error(["meta_file", "employees", i, "schemas"], f"unknown schema '{s}'", "value_error.reference"))
+
+    return errors
+
+
+def check_rostering(rostering, meta):
+    # a roster from outside (edited by planners) refers to shifts, employees and activities of meta
+    employees = set(e['id'] for e in meta['employees'])
+    shifts = set(s['id'] for s in meta['shifts'])
+    activities = set(a['id'] for a in meta['activities'])
+
+    errors = []
+    for i, a in enumerate(rostering['campainSchedule']):
+        loc = ["rostering_file", "campainSchedule", i]
+        missing = [k for k in ('employeeId', 'shiftId', 'shiftDate', 'shiftTimeStart') if k not in a]
+        if missing:
+            errors += [error(loc + [k], "field required", "value_error.missing") for k in missing]
+            continue
+
+        if a['shiftId'] not in shifts:
+            errors.append(error(loc + ["shiftId"], f"unknown shift '{a['shiftId']}'", "value_error.reference"))
+        if a['employeeId'] not in employees:
+            errors.append(error(loc + ["employeeId"], f"unknown employee '{a['employeeId']}'", "value_error.reference"))
+        for j, x in enumerate(a.get('activities', [])):
+            if x.get('activityId') not in activities:
+                errors.append(error(loc + ["activities", j, "activityId"], f"unknown activity '{x.get('activityId')}'", "value_error.reference"))
+
+    return errors
+
+
+def check_shifts(meta):
+    errors = []
+    activities = {a['id']: a for a in meta['activities']}
+
+    for i, s in enumerate(meta['shifts']):
+        loc = ["meta_file", "shifts", i]
+        duration = minutes(s['duration'])
+        step = minutes(s['stepTime'])
+        window = (minutes(s['scheduleTimeEndStart']) - minutes(s['scheduleTimeStart'])) % (24 * 60)
+
+        if duration <= 0:
+            errors.append(error(loc + ["duration"], "shift duration must be positive", "value_error.number.not_gt"))
+        if step <= 0:
+            errors.append(error(loc + ["stepTime"], "step time must be positive", "value_error.number.not_gt"))
+        elif window % step != 0:
+            errors.append(error(loc + ["scheduleTimeEndStart"], f"start window of {window} min is not a multiple of step time {step} min", "value_error.window"))
+
+        shift_activities = [activities[a] for a in s['activities'] if a in activities]
+        for a in shift_activities:
+            if minutes(a['timeEndStart']) + minutes(a['duration']) > duration:
+                errors.append(error(loc + ["activities"], f"activity '{a['id']}' doesn't fit into shift duration", "value_error.window"))
+
+        busy = sum(minutes(a['duration']) for a in shift_activities) \
+            + max(len(shift_activities) - 1, 0) * minutes(s['minIntervalBetweenActivities'])
+        if busy > duration:
+            errors.append(error(loc + ["activities"], "activities with min intervals between them don't fit into shift duration", "value_error.window"))
+
+    return errors
+
+
+def check_hours(meta, days):
+    errors = []
+    shifts = {s['id']: s for s in meta['shifts']}
+    schemas = {s['id']: s for s in meta['schemas']}
+    activities = {a['id']: minutes(a['duration']) for a in meta['activities']}
+
+    bounds_cache = {}
+    for i, e in enumerate(meta['employees']):
+        loc = ["meta_file", "employees", i]
+        min_hours, max_hours = e['minWorkingHours'], e['maxWorkingHours']
+
+        if min_hours > max_hours:
+            errors.append(error(loc + ["minWorkingHours"], f"employee {e['id']}: min working hours {min_hours} > max working hours {max_hours}", "value_error.number.not_le"))
+            continue
+
+        bounds = []
+        for s in e['schemas']:
+            if s not in schemas:
+                continue
+            if s not in bounds_cache:
+                bounds_cache[s] = schema_bounds(schemas[s], shifts, activities, days)
+            if bounds_cache[s] is not None:
+                bounds.append(bounds_cache[s])
+
+        if not bounds:
+            errors.append(error(loc + ["schemas"], f"employee {e['id']}: no feasible day pattern over the planning horizon", "value_error.infeasible"))
+            continue
+
+        achievable_min = min(b[0] * b[2] for b in bounds)
+        achievable_max = max(b[1] * b[3] for b in bounds)
+
+        if min_hours > achievable_max:
+            errors.append(error(loc + ["minWorkingHours"], f"employee {e['id']}: min working hours {min_hours} > achievable {achievable_max:g}", "value_error.infeasible"))
+        elif max_hours < achievable_min:
+            errors.append(error(loc + ["maxWorkingHours"], f"employee {e['id']}: max working hours {max_hours} < achievable {achievable_min:g}", "value_error.infeasible"))
+
+    return errors
+
+
+def check_capacity(meta, df):
+    warnings = []
+
+    positions = required_positions(df)['positions']
+    interval_hours = interval_seconds(df) / 3600
+    required_hours = positions.sum() * interval_hours
+    capacity_hours = sum(e['maxWorkingHours'] for e in meta['employees'])
+
+    if required_hours > capacity_hours:
+        warnings.append(error(["meta_file", "employees"], f"required {required_hours:g} man-hours > max working hours of all employees {capacity_hours:g}", "value_error.capacity"))
+
+    if positions.max() > len(meta['employees']):
+        warnings.append(error(["data_file"], f"peak of {positions.max()} required positions at {positions.idxmax()} > {len(meta['employees'])} employees", "value_error.capacity"))
+
+    return warnings
+
+
+def validate(data, meta):
+    # cheap checks that catch infeasible inputs before the solver does
+    errors = []
+    warnings = []
+
+    try:
+        df, data_errors = parse_data(data)
+        errors += data_errors
+    except Exception as e:
+        df = None
+        errors.append(error(["data_file"], f"can't be parsed: {e}", "value_error.csv"))
+
+    try:
+        meta, meta_errors = parse_meta(meta)
+        errors += meta_errors
+    except Exception as e:
+        errors.append(error(["meta_file"], f"can't be parsed: {e}", "value_error.json"))
+        return (errors, warnings)
+
+    if errors:
+        return (errors, warnings)
+
+    try:
+        errors += check_references(meta)
+        errors += check_shifts(meta)
+    except (KeyError, ValueError, AttributeError) as e:
+        errors.append(error(["meta_file"], f"malformed: {e}", "value_error.json"))
+
+    if errors:
+        return (errors, warnings)
+
+    days = [d.day for d in sorted(set(df.index.date))]
+    try:
+        errors += check_hours(meta, days)
+    except (KeyError, ValueError, AttributeError) as e:
+        errors.append(error(["meta_file"], f"malformed: {e}", "value_error.json"))
+
+    if not errors:
+        warnings += check_capacity(meta, df)
+
+    return (errors, warnings)
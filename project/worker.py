@@ -1,43 +1,242 @@
 import os
-import shutil
 import json
+import time
+from contextlib import contextmanager
 
 import pandas as pd
 from pathlib import Path
 
 from celery import Celery
 from celery import current_task
+from celery.utils.log import get_task_logger
 
 from pyworkforce.staffing import MultiZonePlanner
 
+from admission import record_start, record_duration
+from staffing import required_positions, interval_seconds
+from pruning import prune_shift_starts
+from reroster import plan_reroster, merge_reroster
+from diff import roster_diff
+from horizon import solve_rolling_horizon
+from breaks import breaks_options, planner_breaks, place_breaks
+from portfolio import variant_profiles, race, score
+from stopping import STOPPING_KEYS
+from roster_statistics import roster_statistics
+from coverage import coverage_by_shift
+from quantiles import save_shift_quantiles
+from result_index import build_index
+from result_formats import save_result_formats
+from artifacts import store
+from retention import RETENTION_INTERVAL, collect
+
+logger = get_task_logger(__name__)
+
 celery = Celery(__name__)
 celery.conf.broker_url = os.environ.get("CELERY_BROKER_URL", "redis://localhost:6379")
 celery.conf.result_backend = os.environ.get("CELERY_RESULT_BACKEND", "redis://localhost:6379")
+# retention runs on its own queue, so it never holds a solver worker
+celery.conf.beat_schedule = {
+    'retention': {'task': 'retention_task', 'schedule': RETENTION_INTERVAL}
+}
+celery.conf.task_routes = {'retention_task': {'queue': 'maintenance'}}
+
+SOLVER_PHASES = ['scheduling', 'rostering', 'breaks']
+
+def solver_profile(profile):
+    # worker options live in the profile next to solver phases, the planner gets phases only
+    # stopping criteria are ours: the planner runs its scheduling & rostering searches without callbacks.
+    # submits reject them there, profiles stored before that have them dropped with a warning
+    ignored = [f'{k}.{o}' for k, v in profile.items() if k in SOLVER_PHASES and k != 'breaks' for o in v if o in STOPPING_KEYS]
+    if ignored:
+        logger.warning(f'Stopping criteria ignored: {", ".join(ignored)}')
+
+    solver = {
+        k: {o: value for o, value in v.items() if o not in STOPPING_KEYS}
+        for k, v in profile.items() if k in SOLVER_PHASES
+    }
+    if 'breaks' in solver:
+        solver['breaks'] = planner_breaks(profile)
+
+    return solver
+
+def load_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_json(path, data):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+
+def save_statistics(output_dir, df, rostering, meta):
+    stats = roster_statistics(df, rostering, meta)
+    stats.index = stats.index.strftime('%Y-%m-%d %H:%M:%S')
+    stats.rename_axis('tc').reset_index().to_json(f'{output_dir}/statistics_output.json', orient='records', force_ascii=False)
+
+def roster_score(df, meta, output_dir):
+    # variants are scored on the roster they deliver, whatever engine placed its breaks
+    stats = roster_statistics(df, load_json(f'{output_dir}/rostering.json'), meta)
+    return score(stats['positions'], stats['scheduled_positions'])
+
+def save_coverage(output_dir, df, rostering, meta):
+    coverage = coverage_by_shift(rostering['campainSchedule'], meta, df.index)
+    coverage['tc'] = coverage['tc'].dt.strftime('%Y-%m-%d %H:%M:%S')
+    coverage.to_csv(f'{output_dir}/coverage_output.csv', index=False)
+
+@contextmanager
+def working_dir(task_id):
+    # inputs are fetched from the artifact store into a working directory, all its files are published back;
+    # a local copy of a store elsewhere is dropped then
+    output_dir = store.fetch(task_id)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        yield output_dir
+    finally:
+        store.discard(task_id)
+
+@contextmanager
+def timed(timings, phase):
+    # seconds spent in a phase, summed over its runs
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        timings[phase] = timings.get(phase, 0) + time.monotonic() - started
+
+def task_summary(output_dir, started, timings):
+    # task result: kept by the task registry with inputs of the task
+    duration = time.monotonic() - started
+    record_duration(duration)
+
+    return {
+        'duration': round(duration, 3),
+        'timings': {phase: round(seconds, 3) for phase, seconds in timings.items()},
+        'artifacts': sorted(p.relative_to(output_dir).as_posix() for p in Path(output_dir).rglob('*') if p.is_file())
+    }
 
 @celery.task(name="create_task")
 def create_task():
+    started = time.monotonic()
+    timings = {}
+    record_start(current_task.request.id)
+
+    with working_dir(current_task.request.id) as output_dir:
+        input_csv_path = f'{output_dir}/input'
+        input_meta_path = f'{output_dir}/meta'
+        solver_profile_path = f'{output_dir}/profile'
+
+        df = pd.read_csv(input_csv_path, parse_dates=[0], index_col=0)
+        meta = load_json(input_meta_path)
+        profile = load_json(solver_profile_path)
+
+        aggressiveness = profile.get('pruning', {}).get('aggressiveness', 0)
+        if aggressiveness > 0:
+            positions = required_positions(df)['positions']
+            meta, report = prune_shift_starts(meta, positions, interval_seconds(df) // 60, aggressiveness)
+            logger.info(f'Shift start pruning removed {report["variables_removed"]} variables')
+            save_json(f'{output_dir}/pruning.json', report)
+
+        def solve(df, meta, output_dir, profile):
+            with timed(timings, 'planner'):
+                mzp = MultiZonePlanner(df, meta, solver_profile(profile), output_dir)
+                mzp.solve()
+
+            rostering = load_json(f'{output_dir}/rostering.json')
+
+            if breaks_options(profile).get('engine', 'pyworkforce') != 'pyworkforce':
+                breaks_started = time.monotonic()
+                with timed(timings, 'breaks'):
+                    rostering, report = place_breaks(
+                        rostering, meta, required_positions(df)['positions'], interval_seconds(df) // 60, breaks_options(profile)
+                    )
+                logger.info(f'Breaks placed in {time.monotonic() - breaks_started:.1f}s')
+                save_json(f'{output_dir}/breaks.json', report)
+                # the planner's statistics describe its own breaks
+                save_statistics(output_dir, df, rostering, meta)
+
+            save_json(f'{output_dir}/rostering.json', rostering)
+
+        def run(profile, output_dir):
+            rolling_horizon = profile.get('rolling_horizon')
+            if rolling_horizon:
+                logger.info(f'Rolling horizon of {rolling_horizon.get("window_days", 7)} day windows')
+                solve_rolling_horizon(df, meta, rolling_horizon, output_dir, lambda d, m, o: solve(d, m, o, profile))
+            else:
+                solve(df, meta, output_dir, profile)
+
+        # planner & breaks timings of portfolio variants stay in their processes, solve covers them
+        portfolio = profile.get('portfolio')
+        with timed(timings, 'solve'):
+            if portfolio:
+                profiles = variant_profiles(profile, portfolio)
+                logger.info(f'Portfolio of {len(profiles)} profile variants')
+                report = race(run, profiles, output_dir, portfolio.get('deadline'), lambda d: roster_score(df, meta, d))
+                logger.info(f'Portfolio variant {report["winner"]} won')
+                save_json(f'{output_dir}/portfolio.json', report)
+            else:
+                run(profile, output_dir)
+
+        with timed(timings, 'outputs'):
+            rostering = load_json(f'{output_dir}/rostering.json')
+            save_shift_quantiles(output_dir)
+            save_coverage(output_dir, df, rostering, meta)
+            save_result_formats(output_dir, rostering)
+            build_index(output_dir, rostering)
+
+        with timed(timings, 'publish'):
+            store.publish(current_task.request.id, output_dir)
+
+        return task_summary(output_dir, started, timings)
+
+@celery.task(name="reroster_task")
+def reroster_task(base_id):
+    started = time.monotonic()
+    timings = {}
+    record_start(current_task.request.id)
+
+    with working_dir(current_task.request.id) as output_dir:
+        df = pd.read_csv(f'{output_dir}/input', parse_dates=[0], index_col=0)
+        meta = load_json(f'{output_dir}/meta')
+        profile = load_json(f'{output_dir}/profile')
+        delta = load_json(f'{output_dir}/delta')
+        base_rostering = json.loads(b''.join(store.stream(base_id, 'rostering.json')))
+
+        plan = plan_reroster(df, meta, base_rostering, delta)
+        logger.info(f'Re-roster of {len(plan["affected"])} employees, {len(plan["fixed"])} assignments fixed')
+
+        # meta of this task is the one after changes, so re-rosters can be chained
+        save_json(f'{output_dir}/meta', plan['meta'])
+
+        solved = {'campainSchedule': []}
+        if plan['affected']:
+            solve_dir = f'{output_dir}/reroster'
+            Path(solve_dir).mkdir(parents=True, exist_ok=True)
 
-    output_dir = f'./tmp/{current_task.request.id}'
-    Path(output_dir).mkdir(parents=True, exist_ok=True)
+            with timed(timings, 'planner'):
+                mzp = MultiZonePlanner(plan['demand'], plan['sub_meta'], solver_profile(profile), solve_dir)
+                mzp.solve()
+            solved = load_json(f'{solve_dir}/rostering.json')
 
-    shutil.copyfile("./tmp/data", f'./tmp/{current_task.request.id}/input')
-    shutil.copyfile("./tmp/meta", f'./tmp/{current_task.request.id}/meta')
-    shutil.copyfile("./tmp/solver-profile", f'./tmp/{current_task.request.id}/profile')
+        rostering = merge_reroster(base_rostering, plan, solved)
+        save_json(f'{output_dir}/rostering.json', rostering)
+        save_json(f'{output_dir}/diff.json', roster_diff(base_rostering, rostering))
 
-    input_csv_path = f'./tmp/{current_task.request.id}/input'
-    input_meta_path = f'./tmp/{current_task.request.id}/meta'
-    solver_profile_path = f'./tmp/{current_task.request.id}/profile'
+        with timed(timings, 'outputs'):
+            # the planner's statistics cover the sub-problem only, so they are computed for the merged roster
+            save_statistics(output_dir, df, rostering, plan['meta'])
+            save_coverage(output_dir, df, rostering, plan['meta'])
+            save_result_formats(output_dir, rostering)
+            build_index(output_dir, rostering)
 
-    df = pd.read_csv(input_csv_path, parse_dates=[0], index_col=0)
-    with open(input_meta_path, 'r', encoding='utf-8') as f:
-        meta = json.load(f)
-    with open(solver_profile_path, 'r', encoding='utf-8') as f:
-        profile = json.load(f)
+        with timed(timings, 'publish'):
+            store.publish(current_task.request.id, output_dir)
 
-    mzp = MultiZonePlanner(df, meta, profile, output_dir)
-    mzp.solve()
+        return task_summary(output_dir, started, timings)
 
-    return True
+@celery.task(name="retention_task", ignore_result=True)
+def retention_task():
+    report = collect(store)
+    logger.info(f'Retention: {len(report["removed"])} of {report["tasks"]} tasks removed, '
+                f'{len(report["compressed"])} compressed saving {report["bytes_saved"]} bytes in {report["seconds"]}s')
 
 @celery.task(name="terminate_task")
 def terminate_task(task_id):
@@ -14,7 +14,7 @@ import pandas as pd
 import datetime as dt
 
 from utils.helpers import hh_mm, hh_mm_timedelta, hh_mm_time, get_1Day_df, get_emptyDay_df, get_emptyMonth_df, roll
-from utils.data_loaders import get_statistics_df, get_rostering_schedule_df
+from utils.data_loaders import get_statistics_df, get_rostering_schedule_df, get_coverage_df
 
 @st.cache_data
 def min_max_hours(meta):
@@ -125,6 +125,30 @@ def get_shift_quantiles_df(quantile_files, convert_to_tz = None) -> pd.DataFrame
 
     return df
 
+@st.cache_data
+def get_shift_quantiles_cube(cube_file, convert_to_tz = None) -> pd.DataFrame:
+    # shift_quantiles.parquet of a task: capacity & positions_quantile indexed by (tc, shift)
+    cube = pd.read_parquet(cube_file)
+
+    if convert_to_tz:
+        cube.index = cube.index.set_levels(cube.index.levels[0].tz_convert(convert_to_tz), level='tc')
+
+    return cube
+
+
+def get_shift_quantiles_slice(cube, shifts = None, start = None, end = None) -> pd.DataFrame:
+    # the same frame as get_shift_quantiles_df for the selected shifts and [start, end], by index lookup
+    df = cube.loc[pd.IndexSlice[start:end, :], :]
+
+    if shifts:
+        df = df[df.index.get_level_values('shift').isin(shifts)]
+
+    df = df.groupby(level='tc').sum().reset_index()
+    df['tc_date'] = df['tc'].dt.date
+    df['tc_time'] = df['tc'].dt.time
+
+    return df
+
 # недостаток в позициях, missed = required - scheduled
 def shortage_stat(df: pd.DataFrame):
     avg = df[df['Missed positions'] > 0.0]['Missed positions'].mean()
@@ -144,6 +168,7 @@ def excess_stat(df: pd.DataFrame):
 meta_file = st.sidebar.file_uploader("Файл метаданных (meta_file.json):")
 statistics_file = st.sidebar.file_uploader("Файл статистики (statistics_output.json):")
 rostering_file = st.sidebar.file_uploader("Файл расписания (rostering.json):")
+coverage_file = st.sidebar.file_uploader("Файл покрытия (coverage_output.csv), вместо расписания:")
 
 if meta_file is None:
     st.warning('Для продолжения работы укажите файлы метаданных.', icon="⚠️")
@@ -221,11 +246,15 @@ st.plotly_chart(fig2, use_container_width=True, theme='streamlit')
 # ----------------------------------------------
 st.subheader('Результаты планирования (по расписанию)')
 
-if rostering_file is None:
+if rostering_file is None and coverage_file is None:
     st.warning('Для продолжения работы укажите файлы ростеринга.', icon="⚠️")
     st.stop()
 
-df_rostering = get_rostering_schedule_df(meta_file, rostering_file)
+# сотрудники на смене за вычетом обедов и перерывов
+if coverage_file is not None:
+    df_rostering = get_coverage_df(meta_file, coverage_file)
+else:
+    df_rostering = get_rostering_schedule_df(meta_file, rostering_file)
 
 fig = px.area(df_rostering, y="works", color="utc", line_group="shiftName")
 fig.add_trace(go.Scatter(x=df_stats['tc'], y=df_stats['Required positions'], name='FTE требуемый', line_color="gray"))
@@ -262,6 +291,7 @@ max_day = df_stats.tail(1).iloc[0]['tc_date']
 day_filter = col1.date_input("Выберите день, для сравнения плановых нагрузков и фактической емкости смен", min_value=min_day, max_value=max_day, value=min_day)
 shift_filter = col2.multiselect('Выберите смену', df_meta_capacity['shiftName'].unique())
 quantile_files = st.file_uploader("Файл позиций смены (required_positions_*.csv):", accept_multiple_files=True)
+cube_file = st.file_uploader("Или файл позиций всех смен (shift_quantiles.parquet):")
 
 if day_filter is None:
     st.warning('Для продолжения работы выберите день, на который провести анализ', icon="⚠️")
@@ -292,10 +322,18 @@ df_stats_daily["tc_time"] = df_stats_daily["tc"].dt.time
 
 df_shift_quantiles = None
 df_shift_quantiles_daily = None
-if len(quantile_files) > 0:
+if cube_file is not None:
+    cube = get_shift_quantiles_cube(cube_file, convert_to_tz = campaign_tz)
+    cube_shift_filter = st.multiselect('Выберите смены (позиции смен)', cube.index.get_level_values('shift').unique())
+
+    day_start = pd.Timestamp(day_filter).tz_localize(campaign_tz)
+    df_shift_quantiles = get_shift_quantiles_slice(cube, cube_shift_filter)
+    df_shift_quantiles_daily = get_shift_quantiles_slice(cube, cube_shift_filter, day_start, day_start + pd.Timedelta(days=1) - pd.Timedelta(seconds=1))
+elif len(quantile_files) > 0:
     df_shift_quantiles = get_shift_quantiles_df(quantile_files, convert_to_tz = campaign_tz)
     df_shift_quantiles_daily = df_shift_quantiles[df_shift_quantiles['tc_date'] == day_filter]
 
+if df_shift_quantiles_daily is not None:
     df_shift_quantiles_daily['Missed positions'] = df_shift_quantiles_daily['positions_quantile'] - df_rostering_daily['works']
 
     mp_shortage_avg, mp_shortage_sum_hr = shortage_stat(df_shift_quantiles_daily)  # недостаток в позициях, missed = required - scheduled
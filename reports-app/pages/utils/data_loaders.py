@@ -1,4 +1,5 @@
 import json
+import numpy as np
 import pandas as pd
 import datetime as dt
 import streamlit as st
@@ -71,48 +72,93 @@ def build_shift_meta(meta_file):
     return shifts
 
 
+def interval_counts(index, starts, ends) -> np.ndarray:
+    # number of [start, end) ranges covering every interval start of the index, by difference array
+    edges = np.zeros(len(index) + 1, dtype=int)
+    np.add.at(edges, np.searchsorted(index.values, np.asarray(starts, dtype='datetime64[ns]')), 1)
+    np.add.at(edges, np.searchsorted(index.values, np.asarray(ends, dtype='datetime64[ns]')), -1)
+
+    return np.cumsum(edges)[:-1]
+
+
+def shift_name(shift_meta, shift_id, utc) -> str:
+    (_, _, _, start_start, _, duration, end) = shift_meta[shift_id]
+    return f'utc+{utc}, {duration.seconds // 3600}h: {start_start}-{end}'
+
+
 @st.cache_data
 def get_rostering_schedule_df(meta_file, rostering_file) -> pd.DataFrame:
+    # employees on shift ('on_shift') and on shift but not on a lunch or break ('works') per 15 minutes interval,
+    # by shift and utc zone of employees. all assignments of a month are counted at once
     shift_meta = build_shift_meta(meta_file)
 
     # shift_meta = {}:
     #   shift_id -> (name, utc, utc_text, start_start (time), start_end (time), duration (timedelta), end (time))
 
+    meta = json.loads(meta_file.getvalue())
+    employee_utc = {e['id']: e['utc'] for e in meta['employees']}
+
     rostering = json.load(rostering_file)
 
     campaign_utc = rostering['campainUtc']
     campaign_tz = dt.timezone(dt.timedelta(hours=campaign_utc))
 
     _df = pd.DataFrame(rostering['campainSchedule'])
-    _df['shiftDate'] = pd.to_datetime(_df['shiftDate'], format='%d.%m.%y')
-    start_month = _df['shiftDate'].min()
+    _df['utc'] = _df['employeeId'].map(employee_utc)
+    _df['shiftStart'] = pd.to_datetime(_df['shiftDate'] + ' ' + _df['shiftTimeStart'].str[:5], format='%d.%m.%y %H:%M')
+    _df['shiftEnd'] = _df['shiftStart'] + _df['shiftId'].map(lambda shift_id: shift_meta[shift_id][5])
+
+    # activities are in campaign time of the shift's day, or of the next day when before the shift start
+    _activities = _df[['shiftId', 'utc', 'shiftDate', 'shiftStart', 'activities']].explode('activities').dropna(subset=['activities'])
+    _activities = _activities.assign(
+        activityTimeStart=_activities['activities'].str['activityTimeStart'].str[:5],
+        activityTimeEnd=_activities['activities'].str['activityTimeEnd'].str[:5]
+    )
+    day = pd.to_datetime(_activities['shiftDate'], format='%d.%m.%y')
+    time_start = pd.to_timedelta(_activities['activityTimeStart'] + ':00')
+    time_end = pd.to_timedelta(_activities['activityTimeEnd'] + ':00')
+
+    start = day + time_start
+    start = start.where(start >= _activities['shiftStart'], start + pd.Timedelta(days=1))
+    end = start + (time_end - time_start) % pd.Timedelta(days=1)
+    _activities = _activities.assign(start=start, end=end)
+
+    start_month = pd.to_datetime(_df['shiftDate'], format='%d.%m.%y').min()
     df_zero_month = get_emptyMonth_df(start_month)
-    df_zero_month.index = df_zero_month.index.tz_localize(tz=campaign_tz)
-    df_zero_month.sort_index()
 
-    df_shifts = {}
-    for s in rostering['campainSchedule']:  # this is a single employee day assignment to shift
-        shift_id = s['shiftId']
-        (shift_name, utc, utc_text, start_start, start_end, duration, end) = shift_meta[shift_id]
+    df_shifts = []
+    for (shift_id, utc), shifts in _df.groupby(['shiftId', 'utc']):
+        activities = _activities[(_activities['shiftId'] == shift_id) & (_activities['utc'] == utc)]
+
+        df = df_zero_month.copy()
+        df['on_shift'] = interval_counts(df.index, shifts['shiftStart'], shifts['shiftEnd'])
+        df['works'] = np.maximum(df['on_shift'] - interval_counts(df.index, activities['start'], activities['end']), 0)
+        df['shiftId'] = shift_id
+        df['shiftName'] = shift_name(shift_meta, shift_id, utc)
+        df['utc'] = f'utc+{utc}'
+        df_shifts.append(df)
 
-        if (shift_id not in df_shifts):
-            df = df_zero_month.copy()
-            df['shiftId'] = shift_id
-            df['shiftName'] = shift_name
-            df['utc'] = utc_text
-            df_shifts[shift_id] = df
+    df = pd.concat(df_shifts)
+    df.index = df.index.tz_localize(tz=campaign_tz)
 
-        df = df_shifts[shift_id]
+    return df
 
-        d = dt.datetime.strptime(s['shiftDate'], '%d.%m.%y')
-        hh, mm = hh_mm(s['shiftTimeStart'])
-        shift_start = dt.datetime(year = d.year, month=d.month, day=d.day, hour=hh, minute=mm, second=0, tzinfo=campaign_tz)
-        shift_end = shift_start + duration
 
-        # mask = df.index.indexer_between(shift_start, shift_end)
-        mask = (df.index >= shift_start) & (df.index < shift_end)
-        df.loc[mask, ['works']] += 1
+@st.cache_data
+def get_coverage_df(meta_file, coverage_file) -> pd.DataFrame:
+    # the same frame as get_rostering_schedule_df, read from coverage_output.csv of a task
+    shift_meta = build_shift_meta(meta_file)
+    meta = json.loads(meta_file.getvalue())
+    campaign_tz = dt.timezone(dt.timedelta(hours=meta['campainUtc']))
 
-        df_shifts[shift_id] = df
+    df = pd.read_csv(coverage_file, encoding="utf-8")
+    df['tc'] = pd.to_datetime(df['tc'])
+    df['tc_time'] = df['tc'].dt.time
+    df['tc_date'] = df['tc'].dt.date
+    df['shiftName'] = [shift_name(shift_meta, shift_id, utc) for shift_id, utc in zip(df['shiftId'], df['utc'])]
+    df['utc'] = 'utc+' + df['utc'].astype(str)
+
+    df.set_index('tc', inplace=True)
+    df.index = df.index.tz_localize(tz=campaign_tz)
 
-    return pd.concat(list(df_shifts.values()))
\ No newline at end of file
+    return df